@@ -6,15 +6,31 @@ class CartItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ("price", "subtotal")
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("variant__product")
+
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ("user", "total_items", "total_price", "updated_at")
+    list_select_related = ("user",)
     inlines = [CartItemInline]
     readonly_fields = ("updated_at",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description="Total items", ordering="items_total")
+    def total_items(self, obj):
+        return obj.total_items
+
+    @admin.display(description="Total price", ordering="price_total")
+    def total_price(self, obj):
+        return obj.total_price
+
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ("cart", "variant", "quantity", "price")
+    list_select_related = ("cart", "variant__product")
     list_filter = ("cart__user",)
     readonly_fields = ("price",)
 
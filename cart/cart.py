@@ -1,56 +1,70 @@
-from decimal import Decimal
+import datetime
+import uuid
 from django.conf import settings
-from catalogue.models import ProductVariant
-
-CART_SESSION_ID = "cart"
-
-class Cart:
-    def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(CART_SESSION_ID)
-        if not cart:
-            cart = self.session[CART_SESSION_ID] = {}
-        self.cart = cart
-        self.user = request.user if request.user.is_authenticated else None
-
-    def add(self, variant_id, quantity=1, override_quantity=False):
-        variant = ProductVariant.objects.get(id=variant_id)
-        variant_id_str = str(variant_id)
-        if variant_id_str not in self.cart:
-            self.cart[variant_id_str] = {"quantity": 0, "price": str(variant.final_price)}
-        if override_quantity:
-            self.cart[variant_id_str]["quantity"] = quantity
-        else:
-            self.cart[variant_id_str]["quantity"] += quantity
-        self.save()
-
-    def save(self):
-        self.session[CART_SESSION_ID] = self.cart
-        self.session.modified = True
-
-    def remove(self, variant_id):
-        variant_id_str = str(variant_id)
-        if variant_id_str in self.cart:
-            del self.cart[variant_id_str]
-            self.save()
-
-    def __iter__(self):
-        variant_ids = self.cart.keys()
-        variants = ProductVariant.objects.filter(id__in=variant_ids)
-        cart = self.cart.copy()
-        for variant in variants:
-            item = cart[str(variant.id)]
-            item["variant"] = variant
-            item["price"] = Decimal(item["price"])
-            item["total_price"] = item["price"] * item["quantity"]
-            yield item
-
-    def __len__(self):
-        return sum(item["quantity"] for item in self.cart.values())
-
-    def get_total_price(self):
-        return sum(Decimal(item["price"]) * item["quantity"] for item in self.cart.values())
-
-    def clear(self):
-        self.session[CART_SESSION_ID] = {}
-        self.session.modified = True
+from django.db import transaction
+from django.utils import timezone
+from .models import Cart
+
+CART_COOKIE = "cart_token"
+COOKIE_SALT = "cart.guest"
+
+
+def cookie_age():
+    return getattr(settings, "CART_GUEST_MAX_AGE", 60 * 60 * 24 * 30)
+
+
+def guest_token(request):
+    """The guest cart token from the signed cookie, or None."""
+    value = request.get_signed_cookie(CART_COOKIE, default=None, salt=COOKIE_SALT)
+    try:
+        return uuid.UUID(value) if value else None
+    except ValueError:
+        return None
+
+
+def get_cart(request, create=False):
+    """
+    The cart for this request: the user's cart when logged in, otherwise the
+    guest cart named by the cookie. With ``create`` a missing guest cart is
+    made and remember_cart() must then set the cookie on the response.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        if create:
+            return Cart.objects.get_or_create(user=user)[0]
+        return Cart.objects.filter(user=user).first()
+
+    token = guest_token(request)
+    cart = Cart.objects.filter(token=token).first() if token else None
+    if cart is None and create:
+        cart = Cart.objects.create(token=uuid.uuid4())
+        request.new_cart_token = cart.token
+    return cart
+
+
+def remember_cart(request, response):
+    token = getattr(request, "new_cart_token", None)
+    if token:
+        response.set_signed_cookie(
+            CART_COOKIE, str(token), salt=COOKIE_SALT, max_age=cookie_age(), httponly=True, samesite="Lax",
+            secure=request.is_secure(),
+        )
+    return response
+
+
+def purge_guest_carts(older_than=None, batch_size=1000):
+    """
+    Delete guest carts untouched for ``older_than`` (CART_GUEST_MAX_AGE by
+    default), oldest first in batches read from the (user, updated_at)
+    index, each batch in its own transaction. Returns the number deleted.
+    """
+    cutoff = timezone.now() - (older_than or datetime.timedelta(seconds=cookie_age()))
+    stale = Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff).order_by("updated_at")
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(stale.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            Cart.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
@@ -1,4 +1,6 @@
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+from .cart import get_cart
 
 def cart(request):
-    return {"cart": Cart(request)}
+    # Only query once a template actually reads the cart; never creates one.
+    return {"cart": SimpleLazyObject(lambda: get_cart(request))}
@@ -0,0 +1,19 @@
+import uuid
+from django.utils import timezone
+from core.query_plans import hot_query
+from .models import Cart, CartItem
+
+
+@hot_query("cart:cart_lines")
+def cart_lines():
+    return CartItem.objects.filter(cart_id=1).select_related("variant__product")
+
+
+@hot_query("cart:guest_cart")
+def guest_cart():
+    return Cart.objects.filter(token=uuid.UUID(int=1))
+
+
+@hot_query("cart:abandoned_guest_carts")
+def abandoned_guest_carts():
+    return Cart.objects.filter(user__isnull=True, updated_at__lt=timezone.now()).order_by("updated_at").values("pk")[:1000]
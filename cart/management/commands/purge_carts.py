@@ -0,0 +1,16 @@
+import datetime
+from django.core.management.base import BaseCommand
+from cart.cart import purge_guest_carts
+
+
+class Command(BaseCommand):
+    help = "Delete guest carts that have not been touched for a while."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Defaults to the guest cart cookie lifetime (CART_GUEST_MAX_AGE).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        older_than = datetime.timedelta(days=options["days"]) if options["days"] is not None else None
+        deleted = purge_guest_carts(older_than, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} abandoned guest carts."))
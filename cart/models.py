@@ -1,25 +1,101 @@
-from django.db import models
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from catalogue.models import ProductVariant
 
+
+def _totals(prefix=""):
+    """Item count and price expressions over cart lines reached through ``prefix``."""
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    line = F(f"{prefix}quantity") * (
+        F(f"{prefix}variant__product__base_price") + F(f"{prefix}variant__price_adjustment")
+    )
+    return {
+        "items_total": Coalesce(Sum(f"{prefix}quantity"), Value(0)),
+        "price_total": Coalesce(Sum(line, output_field=price), Value(Decimal("0")), output_field=price),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate ``items_total`` and ``price_total`` for every cart in one grouped query."""
+        return self.annotate(**_totals("items__"))
+
+
 class Cart(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name="cart"
+        related_name="cart",
+        null=True,
+        blank=True,
     )
+    # Guest carts have no user; the browser holds this token in a signed cookie (see cart.cart).
+    token = models.UUIDField(null=True, blank=True, unique=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user__isnull=False) | models.Q(token__isnull=False), name="cart_cart_owner",
+            ),
+        ]
+        indexes = [
+            # purge_carts walks abandoned guest carts (user IS NULL) oldest first.
+            models.Index(fields=["user", "updated_at"], name="cart_cart_guest_idx"),
+        ]
+
     def __str__(self):
-        return f"Cart {self.id}"
+        return f"Cart {self.id}" if self.user_id else f"Guest cart {self.id}"
+
+    def add(self, variant_id, quantity=1):
+        """
+        Add to one line: an UPDATE of that row, or an INSERT when the variant
+        is new to the cart. When a concurrent add inserts the line first, the
+        INSERT hits unique_together and the UPDATE is retried instead.
+        """
+        line = self.items.filter(variant_id=variant_id)
+        if not line.update(quantity=F("quantity") + quantity):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=self, variant_id=variant_id, quantity=quantity)
+            except IntegrityError:
+                if not line.update(quantity=F("quantity") + quantity):
+                    raise
+        self.touch()
+
+    def remove(self, variant_id):
+        self.items.filter(variant_id=variant_id).delete()
+        self.touch()
+
+    def touch(self):
+        Cart.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+        # Lines changed, so the totals below are out of date.
+        self.__dict__.pop("items_total", None)
+        self.__dict__.pop("price_total", None)
+
+    def totals(self):
+        """
+        Item count and price of the cart, from with_totals() annotations or
+        else one aggregate, kept on the instance the same way.
+        """
+        if not hasattr(self, "price_total"):
+            totals = self.items.aggregate(**_totals())
+            self.items_total, self.price_total = totals["items_total"], totals["price_total"]
+        return self.items_total, self.price_total
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()[0]
 
     @property
     def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+        return self.totals()[1]
 
 
 class CartItem(models.Model):
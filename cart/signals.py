@@ -1,31 +1,32 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in
-from .cart import Cart as SessionCart
+from .cart import guest_token
 from .models import Cart, CartItem
-from catalogue.models import ProductVariant
+
 
 @receiver(user_logged_in)
 def merge_carts_on_login(sender, user, request, **kwargs):
-    session_cart = SessionCart(request)
-
-    # If user has no DB cart, create one
-    cart, created = Cart.objects.get_or_create(user=user)
-
-    # Loop through session cart items
-    for item in session_cart:
-        variant = item["variant"]
-        quantity = item["quantity"]
-
-        # Merge or create CartItem
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            variant=variant,
-            defaults={"quantity": quantity}
-        )
+    token = guest_token(request) if request is not None else None
+    if token is None:
+        return
 
+    # A fixed number of statements however many lines either cart holds: add
+    # the guest quantities onto lines the user already has, re-parent the rest
+    # with one UPDATE and drop the emptied guest cart.
+    with transaction.atomic():
+        guest = Cart.objects.filter(token=token).values_list("pk", flat=True).first()
+        if guest is None:
+            return
+        cart, created = Cart.objects.get_or_create(user=user)
+        guest_lines = CartItem.objects.filter(cart_id=guest)
         if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
-
-    # Clear session cart after merge
-    session_cart.clear()
+            CartItem.objects.filter(cart=cart, variant_id__in=guest_lines.values("variant_id")).update(
+                quantity=F("quantity") + Subquery(
+                    guest_lines.filter(variant_id=OuterRef("variant_id")).values("quantity")[:1]
+                )
+            )
+        guest_lines.exclude(variant_id__in=CartItem.objects.filter(cart=cart).values("variant_id")).update(cart=cart)
+        Cart.objects.filter(pk=guest).delete()
+        cart.touch()
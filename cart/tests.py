@@ -1,3 +1,206 @@
-from django.test import TestCase
+import datetime
+import uuid
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from catalogue.models import Category, Product, ProductVariant
+from .cart import CART_COOKIE, COOKIE_SALT
+from .models import Cart, CartItem
 
-# Create your tests here.
+
+def signed_token(token):
+    response = HttpResponse()
+    response.set_signed_cookie(CART_COOKIE, str(token), salt=COOKIE_SALT)
+    return response.cookies[CART_COOKIE].value
+
+
+class MergeCartsOnLoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tees", slug="tees")
+        product = Product.objects.create(category=category, name="Tee", base_price=20)
+        cls.variants = [
+            ProductVariant.objects.create(product=product, name=str(i), sku=f"tee-{i}")
+            for i in range(30)
+        ]
+
+    def login_with_guest_cart(self, user, variants, quantity=2):
+        guest = Cart.objects.create(token=uuid.uuid4())
+        CartItem.objects.bulk_create([CartItem(cart=guest, variant=variant, quantity=quantity) for variant in variants])
+        request = RequestFactory().get("/")
+        request.user = user
+        request.COOKIES[CART_COOKIE] = signed_token(guest.token)
+        with CaptureQueriesContext(connection) as queries:
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+        self.assertFalse(Cart.objects.filter(pk=guest.pk).exists())
+        return len(queries)
+
+    def make_user(self, email):
+        return get_user_model().objects.create_user(email=email, username=email, password="x")
+
+    def test_merges_into_existing_lines(self):
+        user = self.make_user("a@example.com")
+        CartItem.objects.create(cart=user.cart, variant=self.variants[0], quantity=1)
+
+        self.login_with_guest_cart(user, self.variants[:2], quantity=3)
+
+        quantities = dict(user.cart.items.values_list("variant_id", "quantity"))
+        self.assertEqual(quantities, {self.variants[0].id: 4, self.variants[1].id: 3})
+
+    def test_ignores_unknown_or_forged_tokens(self):
+        user = self.make_user("b@example.com")
+        request = RequestFactory().get("/")
+        request.user = user
+        for cookie in (signed_token(uuid.uuid4()), str(uuid.uuid4())):
+            request.COOKIES[CART_COOKIE] = cookie
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+        self.assertFalse(user.cart.items.exists())
+
+    def test_query_count_is_constant_in_cart_size(self):
+        small_user = self.make_user("small@example.com")
+        CartItem.objects.create(cart=small_user.cart, variant=self.variants[0])
+        small = self.login_with_guest_cart(small_user, self.variants[:2])
+
+        large_user = self.make_user("large@example.com")
+        for variant in self.variants[:10]:
+            CartItem.objects.create(cart=large_user.cart, variant=variant)
+        large = self.login_with_guest_cart(large_user, self.variants)
+
+        self.assertEqual(small, large)
+        self.assertEqual(large_user.cart.items.count(), 30)
+
+
+class CartTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tees", slug="tees")
+        product = Product.objects.create(category=category, name="Tee", base_price=Decimal("20.00"))
+        cls.plain = ProductVariant.objects.create(product=product, name="S", sku="tee-s")
+        cls.large = ProductVariant.objects.create(product=product, name="XL", sku="tee-xl", price_adjustment=Decimal("2.50"))
+        User = get_user_model()
+        cls.users = [User.objects.create_user(email=f"{i}@example.com", username=str(i), password="x") for i in range(3)]
+        for user in cls.users:
+            CartItem.objects.create(cart=user.cart, variant=cls.plain, quantity=2)
+            CartItem.objects.create(cart=user.cart, variant=cls.large, quantity=3)
+
+    def test_totals_are_one_aggregate(self):
+        cart = Cart.objects.get(user=self.users[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(cart.total_price, Decimal("107.50"))
+            self.assertEqual(cart.total_items, 5)
+
+        cart.add(self.plain.pk)
+        self.assertEqual((cart.total_items, cart.total_price), (6, Decimal("127.50")))
+
+    def test_pages_total_the_lines_they_already_loaded(self):
+        self.client.force_login(self.users[0])
+        for url in (reverse("cart:cart_detail"), reverse("orders:checkout")):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, "107.50")
+            self.assertFalse([query for query in queries if "SUM(" in query["sql"]], url)
+
+    def test_empty_cart_totals_are_zero(self):
+        user = get_user_model().objects.create_user(email="empty@example.com", username="empty", password="x")
+        cart = Cart.objects.get(user=user)
+        self.assertEqual((cart.total_items, cart.total_price), (0, Decimal("0")))
+
+    def test_with_totals_annotates_every_cart(self):
+        with self.assertNumQueries(1):
+            totals = [(cart.total_items, cart.total_price) for cart in Cart.objects.with_totals().order_by("pk")]
+        self.assertEqual(totals, [(5, Decimal("107.50"))] * 3)
+
+    def test_admin_changelist_query_count_is_constant(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", username="admin", password="x")
+        self.client.force_login(admin)
+        url = reverse("admin:cart_cart_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for user in self.users:
+            user.cart.items.update(quantity=1)
+        extra = get_user_model().objects.create_user(email="more@example.com", username="more", password="x")
+        CartItem.objects.create(cart=extra.cart, variant=self.large)
+        with CaptureQueriesContext(connection) as more:
+            response = self.client.get(url)
+        self.assertContains(response, 'field-total_price">22.5')
+        self.assertEqual(len(few), len(more))
+
+
+class GuestCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tees", slug="tees")
+        product = Product.objects.create(category=category, name="Tee", base_price=Decimal("20.00"))
+        cls.variants = [ProductVariant.objects.create(product=product, name=str(i), sku=f"guest-{i}") for i in range(2)]
+
+    def add(self, variant, quantity=1):
+        return self.client.post(reverse("cart:add_to_cart", args=[variant.id]), {"quantity": quantity})
+
+    def test_add_retries_the_update_when_a_concurrent_add_inserted_first(self):
+        cart = Cart.objects.create(token=uuid.uuid4())
+        CartItem.objects.create(cart=cart, variant=self.variants[0], quantity=1)
+        update = QuerySet.update
+        calls = []
+
+        def racing_update(queryset, **kwargs):
+            # The first UPDATE runs before the other request's INSERT commits.
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", racing_update):
+            cart.add(self.variants[0].id, 2)
+        self.assertEqual(cart.items.get().quantity, 3)
+
+    def test_guest_cart_lives_in_the_cart_tables(self):
+        response = self.add(self.variants[0], 2)
+        self.assertIn(CART_COOKIE, response.cookies)
+        cart = Cart.objects.get(user__isnull=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add(self.variants[0])
+        self.assertNotIn(CART_COOKIE, response.cookies)
+        writes = [q["sql"] for q in queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(all("django_session" not in sql for sql in writes))
+        self.assertFalse(Session.objects.exists())
+
+        self.add(self.variants[1])
+        self.assertEqual(dict(cart.items.values_list("variant_id", "quantity")), {self.variants[0].id: 3, self.variants[1].id: 1})
+        response = self.client.get(reverse("cart:cart_detail"))
+        self.assertEqual(response.context["total"], Decimal("80.00"))
+
+        self.client.get(reverse("cart:remove_from_cart", args=[self.variants[1].id]))
+        self.assertEqual(cart.items.count(), 1)
+
+    def test_login_moves_guest_lines_to_the_user(self):
+        user = get_user_model().objects.create_user(email="guest@example.com", username="guest", password="pw-12345")
+        self.add(self.variants[0], 2)
+        self.client.post(reverse("accounts:login"), {"username": "guest@example.com", "password": "pw-12345"})
+        self.assertEqual(dict(user.cart.items.values_list("variant_id", "quantity")), {self.variants[0].id: 2})
+        self.assertFalse(Cart.objects.filter(user__isnull=True).exists())
+
+    def test_purge_deletes_only_abandoned_guest_carts(self):
+        old = timezone.now() - datetime.timedelta(days=40)
+        user = get_user_model().objects.create_user(email="kept@example.com", username="kept", password="x")
+        stale = [Cart.objects.create(token=uuid.uuid4()) for _ in range(5)]
+        fresh = Cart.objects.create(token=uuid.uuid4())
+        CartItem.objects.create(cart=stale[0], variant=self.variants[0])
+        Cart.objects.filter(pk__in=[cart.pk for cart in stale] + [user.cart.pk]).update(updated_at=old)
+
+        out = StringIO()
+        call_command("purge_carts", "--days", "30", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 5", out.getvalue())
+        self.assertEqual(set(Cart.objects.values_list("pk", flat=True)), {fresh.pk, user.cart.pk})
+        self.assertFalse(CartItem.objects.exists())
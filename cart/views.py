@@ -1,6 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .cart import Cart as SessionCart
-from .models import Cart, CartItem
+from .cart import get_cart, remember_cart
 from catalogue.models import ProductVariant
 
 
@@ -8,46 +7,30 @@ def add_to_cart(request, variant_id):
     variant = get_object_or_404(ProductVariant, id=variant_id)
     quantity = int(request.POST.get("quantity", 1))
 
-    if request.user.is_authenticated:
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        item, created = CartItem.objects.get_or_create(cart=cart, variant=variant)
-        if created:
-            item.quantity = quantity
-        else:
-            item.quantity += quantity
-        item.save()
-    else:
-        session_cart = SessionCart(request)
-        session_cart.add(variant_id, quantity)
+    cart = get_cart(request, create=True)
+    cart.add(variant.id, quantity)
 
-    return redirect("cart:cart_detail")
+    return remember_cart(request, redirect("cart:cart_detail"))
 
 
 def remove_from_cart(request, variant_id):
-    if request.user.is_authenticated:
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        CartItem.objects.filter(cart=cart, variant_id=variant_id).delete()
-    else:
-        session_cart = SessionCart(request)
-        session_cart.remove(variant_id)
+    cart = get_cart(request)
+    if cart is not None:
+        cart.remove(variant_id)
 
     return redirect("cart:cart_detail")
 
 
 def cart_detail(request):
-    if request.user.is_authenticated:
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        items = cart.items.select_related("variant", "variant__product")
-        total = cart.total_price
-        is_persistent = True
+    cart = get_cart(request)
+    if cart is not None:
+        items = list(cart.items.select_related("variant", "variant__product"))
+        total = sum(item.subtotal for item in items)
     else:
-        session_cart = SessionCart(request)
-        items = list(session_cart)
-        total = session_cart.get_total_price()
-        is_persistent = False
+        items, total = [], 0
 
     return render(request, "cart/cart_detail.html", {
         "items": items,
         "total": total,
-        "is_persistent": is_persistent,
+        "is_persistent": request.user.is_authenticated,
     })
@@ -1,4 +1,12 @@
-from django.contrib import admin
+import os
+import tempfile
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from core import exports
+from .bulk_io import HEADER, export_rows, file_format, import_catalogue, read_rows
 from .models import Category, Product, ProductVariant, ProductImage
 
 @admin.register(Category)
@@ -14,8 +22,60 @@ class ProductVariantInline(admin.TabularInline):
     model = ProductVariant
     extra = 1
 
+class CatalogueImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or XLSX with the columns: " + ", ".join(HEADER))
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        try:
+            file_format(upload.name)
+        except ValueError as exc:
+            raise forms.ValidationError(str(exc))
+        return upload
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("name", "category", "base_price", "is_featured", "rating")
     prepopulated_fields = {"slug": ("name",)}
     inlines = [ProductVariantInline, ProductImageInline]
+    actions = ["export_csv", "export_xlsx"]
+    change_list_template = "admin/catalogue/product/change_list.html"
+
+    @admin.action(description="Export selected products as CSV")
+    def export_csv(self, request, queryset):
+        return exports.csv_response("catalogue.csv", HEADER, export_rows(queryset))
+
+    @admin.action(description="Export selected products as XLSX")
+    def export_xlsx(self, request, queryset):
+        return exports.xlsx_response("catalogue.xlsx", HEADER, export_rows(queryset), sheet="Catalogue")
+
+    def get_urls(self):
+        return [
+            path("import/", self.admin_site.admin_view(self.import_view), name="catalogue_product_import"),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect("admin:catalogue_product_changelist")
+        form = CatalogueImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            # Spool the upload to disk so openpyxl can stream it in read-only mode.
+            suffix = "." + file_format(upload.name)
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
+                for chunk in upload.chunks():
+                    handle.write(chunk)
+            try:
+                result = import_catalogue(read_rows(handle.name))
+            finally:
+                os.unlink(handle.name)
+            for error in result.errors:
+                self.message_user(request, error, messages.WARNING)
+            self.message_user(request, (
+                f"Imported {result.rows} rows ({result.products} products, {result.variants} variants) "
+                f"in {result.elapsed:.1f}s; {result.error_count} rows skipped."
+            ))
+            return redirect("admin:catalogue_product_changelist")
+        context = dict(self.admin_site.each_context(request), form=form, opts=self.model._meta, title="Import catalogue")
+        return TemplateResponse(request, "admin/catalogue/product/import.html", context)
+
@@ -0,0 +1,200 @@
+import bisect
+import re
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q
+from .search import TOKEN_RE
+
+VERSION_KEY = "catalogue:autocomplete:version"
+
+
+def _terms(*values):
+    terms = set()
+    for value in values:
+        terms.update(TOKEN_RE.findall(value.lower().replace("_", " ")))
+    return terms
+
+
+def filter_prefix(queryset, query):
+    """
+    The database version of AutocompleteIndex.lookup(): products with a word
+    in the name or slug starting with every term of ``query``. Used while the
+    index is cold so both paths return the same matches.
+    """
+    for term in _terms(query):
+        # Underscores count as separators, as in _terms().
+        pattern = r"(^|\W|_)" + re.escape(term)
+        queryset = queryset.filter(Q(name__iregex=pattern) | Q(slug__iregex=pattern))
+    return queryset
+
+
+class AutocompleteIndex:
+    """
+    Word-prefix index of active product names and slugs.
+
+    Terms are kept in one sorted list of ``(term, product_id)`` pairs, so a
+    prefix lookup is a bisect followed by a short forward scan. The index is
+    built lazily in each worker process (the first cold lookup starts a
+    background build) and then patched from the Product signals (changes
+    that arrive while a build is reading the table are replayed on top of
+    it). Patches replace the key list rather than editing it in place,
+    so a lookup can scan the list it picked up without holding the lock. When
+    ``CATALOGUE_AUTOCOMPLETE_SHARED`` is on, changes also bump a version in the
+    default cache so the other worker processes notice and rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warming = False
+        self._pending = None
+        self.clear()
+
+    def clear(self):
+        # A build in progress is abandoned rather than published.
+        self._pending = None
+        self._products = {}
+        self._keys = []
+        self._ready = False
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def ready(self):
+        if self._ready and self._is_stale():
+            self._ready = False
+        return self._ready
+
+    def _is_stale(self):
+        if not getattr(settings, "CATALOGUE_AUTOCOMPLETE_SHARED", False):
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < getattr(settings, "CATALOGUE_AUTOCOMPLETE_SYNC_INTERVAL", 5):
+            return False
+        self._checked_at = now
+        return cache.get(VERSION_KEY) != self._version
+
+    def _rows(self):
+        from .models import Product
+
+        return Product.objects.filter(is_active=True).values_list("id", "name", "slug").iterator(chunk_size=2000)
+
+    def build(self):
+        with self._lock:
+            self._pending = []
+        version = cache.get(VERSION_KEY)
+        products = {}
+        keys = []
+        for product_id, name, slug in self._rows():
+            products[product_id] = (name, slug)
+            keys.extend((term, product_id) for term in _terms(name, slug))
+        keys.sort()
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is None:
+                return
+            self._products = products
+            self._keys = keys
+            for product_id, entry in pending:
+                self._apply(product_id, entry)
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._ready = True
+
+    def warm_async(self):
+        with self._lock:
+            if self._warming:
+                return
+            self._warming = True
+
+        def run():
+            try:
+                self.build()
+            finally:
+                self._warming = False
+                close_old_connections()
+
+        threading.Thread(target=run, name="autocomplete-warm", daemon=True).start()
+
+    def _apply(self, product_id, entry):
+        """Replace the terms of ``product_id`` with those of ``entry`` ((name, slug), or None to drop it)."""
+        keys = list(self._keys)
+        old = self._products.pop(product_id, None)
+        for term in _terms(*old) if old else ():
+            position = bisect.bisect_left(keys, (term, product_id))
+            if position < len(keys) and keys[position] == (term, product_id):
+                del keys[position]
+        if entry is not None:
+            self._products[product_id] = entry
+            for term in _terms(*entry):
+                bisect.insort(keys, (term, product_id))
+        self._keys = keys
+
+    def _change(self, product_id, entry):
+        with self._lock:
+            if self._ready:
+                self._apply(product_id, entry)
+            elif self._pending is not None:
+                self._pending.append((product_id, entry))
+        self._publish()
+
+    def update(self, product):
+        self._change(product.pk, (product.name, product.slug) if product.is_active else None)
+
+    def remove(self, product_id):
+        self._change(product_id, None)
+
+    def invalidate(self):
+        """Drop the index after a bulk change that bypassed the signals; the next lookup rebuilds it."""
+        with self._lock:
+            self.clear()
+        self._publish()
+
+    def _publish(self):
+        if not getattr(settings, "CATALOGUE_AUTOCOMPLETE_SHARED", False):
+            return
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+            return
+        with self._lock:
+            # Only a bump straight from the version this index was built at is
+            # ours alone; any other gap means another worker changed something
+            # too, so the index stays behind and is rebuilt at the next check.
+            if version - 1 == self._version:
+                self._version = version
+
+    def lookup(self, query, limit=8):
+        """Products whose words start with every term of ``query``, or ``None`` if not ready."""
+        if not self.ready:
+            return None
+        terms = sorted(_terms(query), key=len, reverse=True)
+        if not terms:
+            return []
+
+        keys, products = self._keys, self._products
+        head, rest = terms[0], terms[1:]
+        results, seen = [], set()
+        position = bisect.bisect_left(keys, (head,))
+        while position < len(keys) and len(results) < limit:
+            term, product_id = keys[position]
+            if not term.startswith(head):
+                break
+            position += 1
+            entry = products.get(product_id)
+            if product_id in seen or entry is None:
+                continue
+            seen.add(product_id)
+            if rest:
+                words = _terms(*entry)
+                if not all(any(word.startswith(t) for word in words) for t in rest):
+                    continue
+            results.append({"name": entry[0], "slug": entry[1]})
+        return results
+
+
+product_index = AutocompleteIndex()
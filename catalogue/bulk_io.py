@@ -0,0 +1,288 @@
+import csv
+import io
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.text import slugify
+import openpyxl
+from core import exports
+from core.page_cache import bump_catalogue_version
+from . import category_tree, search
+from .autocomplete import product_index
+from .models import Category, Product, ProductVariant
+
+# One row per variant; a product without variants gets a single row with an empty sku.
+HEADER = (
+    "category_slug", "category_name", "parent_slug",
+    "product_slug", "product_name", "description", "base_price", "is_active", "is_featured", "rating",
+    "sku", "variant_name", "size", "color", "price_adjustment", "stock",
+)
+PRODUCT_FIELDS = ["category", "name", "description", "base_price", "is_active", "is_featured", "rating"]
+VARIANT_FIELDS = ["product", "name", "size", "color", "price_adjustment", "stock"]
+MAX_ERRORS = 100
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.products = 0
+        self.variants = 0
+        self.categories = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, message, line=None):
+        # Only the first few messages are kept so a badly broken file cannot grow memory.
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"line {line}: {message}" if line else str(message))
+
+
+def file_format(name, fmt=None):
+    fmt = (fmt or os.path.splitext(name)[1].lstrip(".")).lower()
+    if fmt not in ("csv", "xlsx"):
+        raise ValueError(f"Unsupported format {fmt!r}; use csv or xlsx.")
+    return fmt
+
+
+def export_rows(queryset=None, chunk_size=2000):
+    """Yield HEADER-ordered rows, streaming products in chunks with their variants prefetched."""
+    queryset = Product.objects.all() if queryset is None else queryset
+    products = queryset.select_related("category__parent").prefetch_related("variants").order_by("id")
+    for product in products.iterator(chunk_size=chunk_size):
+        category = product.category
+        head = [
+            category.slug, category.name, category.parent.slug if category.parent else "",
+            product.slug, product.name, product.description, product.base_price,
+            int(product.is_active), int(product.is_featured), product.rating,
+        ]
+        variants = sorted(product.variants.all(), key=lambda variant: variant.id)
+        if not variants:
+            yield head + ["", "", "", "", "", ""]
+        for variant in variants:
+            yield head + [variant.sku, variant.name, variant.size, variant.color, variant.price_adjustment, variant.stock]
+
+
+def export_catalogue(path, queryset=None, fmt=None, chunk_size=2000):
+    fmt = file_format(path, fmt)
+    rows = export_rows(queryset, chunk_size)
+    if fmt == "xlsx":
+        return exports.write_xlsx(path, HEADER, rows, sheet="Catalogue")
+    return exports.write_csv(path, HEADER, rows)
+
+
+def read_rows(source, fmt=None):
+    """
+    Yield one dict per data row of a CSV or XLSX file, without loading the
+    file into memory. ``source`` is a path or a binary file object.
+    """
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    fmt = file_format(name, fmt)
+    if fmt == "csv":
+        if isinstance(source, str):
+            with open(source, newline="", encoding="utf-8-sig") as handle:
+                yield from csv.DictReader(handle)
+        else:
+            yield from csv.DictReader(io.TextIOWrapper(source, encoding="utf-8-sig", newline=""))
+        return
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value or "").strip() for value in next(rows, ())]
+        for row in rows:
+            if any(value not in (None, "") for value in row):
+                yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _decimal(row, key, model, default=None, minimum=None, maximum=None):
+    """
+    ``key`` as a Decimal that fits ``model``'s column, so an out-of-range
+    value is reported against its row instead of failing the batch's INSERT.
+    """
+    value = _text(row, key)
+    if not value:
+        if default is None:
+            raise ValueError(f"{key} is required")
+        return default
+    try:
+        number = Decimal(value).quantize(Decimal("0.01"))
+        model._meta.get_field(key).run_validators(number)
+    except InvalidOperation:
+        raise ValueError(f"{key} {value!r} is not a number")
+    except ValidationError as exc:
+        raise ValueError(f"{key} {value!r}: {' '.join(exc.messages)}")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{key} {value!r} is below {minimum}")
+    if maximum is not None and number > maximum:
+        raise ValueError(f"{key} {value!r} is above {maximum}")
+    return number
+
+
+def _integer(row, key, default=0):
+    value = _text(row, key)
+    if not value:
+        return default
+    try:
+        number = int(Decimal(value))
+    except InvalidOperation:
+        raise ValueError(f"{key} {value!r} is not a whole number")
+    if number < 0:
+        raise ValueError(f"{key} cannot be negative")
+    return number
+
+
+def _boolean(row, key, default):
+    value = _text(row, key)
+    return value.lower() in TRUE_VALUES if value else default
+
+
+def _parse(row):
+    category_slug = _text(row, "category_slug") or slugify(_text(row, "category_name"))
+    if not category_slug:
+        raise ValueError("category_slug or category_name is required")
+    name = _text(row, "product_name")
+    slug = _text(row, "product_slug") or slugify(name)
+    if not name or not slug:
+        raise ValueError("product_name is required")
+
+    category = (category_slug, _text(row, "category_name") or category_slug, _text(row, "parent_slug"))
+    product = {
+        "slug": slug,
+        "name": name,
+        "description": _text(row, "description"),
+        "base_price": _decimal(row, "base_price", Product, minimum=0),
+        "is_active": _boolean(row, "is_active", True),
+        "is_featured": _boolean(row, "is_featured", False),
+        "rating": _decimal(row, "rating", Product, Decimal("0"), minimum=0, maximum=5),
+    }
+    variant = None
+    sku = _text(row, "sku")
+    if sku:
+        variant = {
+            "sku": sku,
+            "name": _text(row, "variant_name") or sku,
+            "size": _text(row, "size"),
+            "color": _text(row, "color"),
+            "price_adjustment": _decimal(row, "price_adjustment", ProductVariant, Decimal("0")),
+            "stock": _integer(row, "stock"),
+        }
+    return category, product, variant
+
+
+def _resolve_categories(wanted, category_ids, result):
+    """
+    Upsert the categories first seen in this batch and record their ids in
+    ``category_ids``, which lives for the whole import so each category is
+    written once. Parents missing from the database are created from their slug.
+    """
+    Category.objects.bulk_create(
+        [Category(slug=slug, name=name) for slug, (name, parent) in wanted.items()],
+        update_conflicts=True, unique_fields=["slug"], update_fields=["name"],
+    )
+    parents = {parent for name, parent in wanted.values() if parent} - set(category_ids) - set(wanted)
+    Category.objects.bulk_create(
+        [Category(slug=slug, name=slug.replace("-", " ").title()) for slug in parents], ignore_conflicts=True
+    )
+    category_ids.update(Category.objects.filter(slug__in=set(wanted) | parents).values_list("slug", "id"))
+    result.categories += len(wanted)
+
+    children = []
+    for slug, (name, parent) in wanted.items():
+        if parent == slug:
+            result.add_error(f"category {slug!r} cannot be its own parent")
+        elif parent:
+            children.append(Category(id=category_ids[slug], parent_id=category_ids[parent]))
+    Category.objects.bulk_update(children, ["parent"])
+
+
+def _import_batch(batch, seen, category_ids, result):
+    categories, products, variants = {}, {}, {}
+    for line, row in batch:
+        try:
+            category, product, variant = _parse(row)
+        except ValueError as exc:
+            result.add_error(exc, line)
+            continue
+        slug = category[0]
+        if slug not in seen:
+            categories[slug] = category[1:]
+        # Later rows win, which also keeps each slug/sku to one row per upsert statement.
+        products[product["slug"]] = (slug, product)
+        if variant:
+            variants[variant["sku"]] = (product["slug"], variant)
+
+    with transaction.atomic():
+        if categories:
+            _resolve_categories(categories, category_ids, result)
+            seen.update(categories)
+        Product.objects.bulk_create(
+            [Product(category_id=category_ids[slug], **fields) for slug, fields in products.values()],
+            update_conflicts=True, unique_fields=["slug"], update_fields=PRODUCT_FIELDS,
+        )
+        product_ids = dict(Product.objects.filter(slug__in=products).values_list("slug", "id"))
+        ProductVariant.objects.bulk_create(
+            [ProductVariant(product_id=product_ids[slug], **fields) for slug, fields in variants.values()],
+            update_conflicts=True, unique_fields=["sku"], update_fields=VARIANT_FIELDS,
+        )
+        # bulk_create skips the post_save handlers, so do their work once per batch.
+        Product.objects.filter(id__in=product_ids.values()).refresh_summary()
+        search.index_products(product_ids.values())
+
+    result.products += len(products)
+    result.variants += len(variants)
+
+
+def import_catalogue(rows, batch_size=1000, progress=None):
+    """
+    Upsert categories, products and variants from ``rows`` (dicts keyed by
+    HEADER) in batches of ``batch_size``. Products match on slug, variants on
+    sku and categories on slug. Invalid rows are skipped and reported in the
+    returned ImportResult; ``progress`` is called with it after every batch.
+    """
+    result = ImportResult()
+    seen, category_ids = set(), {}
+    batch = []
+    try:
+        for line, row in enumerate(rows, start=2):
+            batch.append((line, row))
+            result.rows += 1
+            if len(batch) == batch_size:
+                _import_batch(batch, seen, category_ids, result)
+                batch = []
+                result.elapsed = time.monotonic() - result.started
+                if progress:
+                    progress(result)
+        if batch:
+            _import_batch(batch, seen, category_ids, result)
+    finally:
+        if seen:
+            # bulk_create/bulk_update bypass Category.save(), which maintains the paths.
+            Category.rebuild_paths()
+            category_tree.bump_version()
+            # Renamed categories change the search text of products that were not in the file.
+            search.index_categories(category_ids[slug] for slug in seen)
+            product_index.invalidate()
+            bump_catalogue_version()
+        result.elapsed = time.monotonic() - result.started
+    return result
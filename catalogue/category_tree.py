@@ -0,0 +1,70 @@
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from .models import Category
+
+VERSION_KEY = "catalogue:category_tree:version"
+
+# Process-wide copy of the tree, tagged with the version it was built at.
+_loaded = {"version": None, "tree": None}
+
+
+class CategoryTree:
+    """
+    Every category, loaded in one query and linked in memory. Each node gets
+    a ``subcategories`` list, sorted by name like ``roots``.
+    """
+
+    def __init__(self, categories):
+        categories = sorted(categories, key=lambda category: category.name.lower())
+        self.by_id = {category.pk: category for category in categories}
+        self.by_slug = {category.slug: category for category in categories}
+        self.roots = []
+        for category in categories:
+            category.subcategories = []
+        for category in categories:
+            parent = self.by_id.get(category.parent_id)
+            (parent.subcategories if parent else self.roots).append(category)
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def ancestors(self, category):
+        """Root-first list of the categories above ``category``, read off its path."""
+        ids = [int(pk) for pk in category.path.strip("/").split("/")[:-1] if pk]
+        return [self.by_id[pk] for pk in ids if pk in self.by_id]
+
+
+def bump_version():
+    version = uuid.uuid4().hex
+    cache.set(VERSION_KEY, version, getattr(settings, "VERSION_STAMP_TIMEOUT", 30))
+    return version
+
+
+def category_tree():
+    """
+    The cached tree, rebuilt only when the version stamp in the cache moves.
+    With a process-local cache the stamp expires after VERSION_STAMP_TIMEOUT
+    seconds, so changes made in another worker show up within that window.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = bump_version()
+    if _loaded["version"] != version:
+        _loaded["tree"] = CategoryTree(Category.objects.all())
+        _loaded["version"] = version
+    return _loaded["tree"]
+
+
+def find_category(slug):
+    """
+    The category for ``slug``, from the tree or, when the tree does not know
+    it yet (created by another worker since the build), from the database;
+    a category found that way also retires the tree for the next call.
+    """
+    category = category_tree().get(slug)
+    if category is None:
+        category = Category.objects.filter(slug=slug).first()
+        if category is not None:
+            _loaded["version"] = None
+    return category
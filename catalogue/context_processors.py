@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+from .category_tree import category_tree
+
+
+def categories(request):
+    # Top-level categories with their subcategories, for the navbar; no query once the tree is cached.
+    return {"categories": SimpleLazyObject(lambda: category_tree().roots)}
@@ -0,0 +1,173 @@
+import hashlib
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, IntegerField, Value, When
+from django.db.models.functions import Cast
+from django.utils.http import urlencode
+from core.page_cache import catalogue_version
+from .category_tree import category_tree
+from .models import ProductVariant
+
+# Query parameters that narrow the listing; paging parameters are left out of the cache key.
+FILTER_PARAMS = ("category", "min_price", "max_price", "min_rating", "in_stock", "size", "color")
+RATINGS = (4, 3, 2, 1)
+
+
+def price_edges():
+    return tuple(getattr(settings, "CATALOGUE_PRICE_BUCKETS", (1000, 2500, 5000, 10000)))
+
+
+def _bucket(field, edges):
+    # 0 below the first edge, 1 below the second, ...; len(edges) above the last.
+    return Case(
+        *[When(**{f"{field}__lt": edge}, then=Value(position)) for position, edge in enumerate(edges)],
+        default=Value(len(edges)),
+        output_field=IntegerField(),
+    )
+
+
+def _grouped(queryset, facet, value, count="pk"):
+    return (
+        queryset.annotate(facet=Value(facet, output_field=CharField()), value=Cast(value, CharField()))
+        .values("facet", "value").annotate(count=Count(count, distinct=count != "pk")).order_by()
+    )
+
+
+def facet_union(products):
+    """One UNION ALL of grouped counts, yielding (facet, value, count) rows for every facet."""
+    products = products.order_by().prefetch_related(None)
+    in_stock = Case(When(in_stock=True, then=Value(1)), default=Value(0), output_field=IntegerField())
+    ratings = Case(
+        *[When(rating__gte=rating, then=Value(rating)) for rating in RATINGS],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    variants = ProductVariant.objects.filter(product__in=products.values("pk"))
+    parts = [
+        _grouped(products, "category", "category_id"),
+        _grouped(products, "price", _bucket("min_price", price_edges())),
+        _grouped(products, "rating", ratings),
+        _grouped(products, "in_stock", in_stock),
+        _grouped(variants.exclude(size=""), "size", "size", count="product_id"),
+        _grouped(variants.exclude(color=""), "color", "color", count="product_id"),
+    ]
+    return parts[0].union(*parts[1:], all=True).values_list("facet", "value", "count")
+
+
+def count_facets(products):
+    """``{facet: {value: product count}}`` over ``products``, in one query."""
+    counts = {}
+    for facet, value, count in facet_union(products):
+        counts.setdefault(facet, {})[value] = count
+    return counts
+
+
+def signature(params):
+    pairs = sorted((key, value) for key in FILTER_PARAMS for value in params.getlist(key) if value)
+    return hashlib.md5(repr(pairs).encode("utf-8")).hexdigest()
+
+
+def cached_counts(products, params):
+    """count_facets(), cached per catalogue version and filter signature."""
+    key = f"catalogue:facets:{catalogue_version()}:{signature(params)}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = count_facets(products)
+        cache.set(key, counts, getattr(settings, "CATALOGUE_FACET_CACHE_TIMEOUT", 600))
+    return counts
+
+
+def _link(params, **changes):
+    query = {key: params.get(key) for key in FILTER_PARAMS if params.get(key)}
+    query.update(changes)
+    return "?" + urlencode({key: value for key, value in query.items() if value})
+
+
+def _money(value):
+    return f"{Decimal(value):,.0f}"
+
+
+def build_facets(products, params):
+    """
+    Facet groups for the listing template: a label plus options with a
+    product count, a link that applies (or clears) the option and whether
+    it is selected. Counts are over the already-filtered ``products``.
+    """
+    counts = cached_counts(products, params)
+    facets = []
+
+    tree = category_tree()
+    category_counts = {}
+    for category_id, count in counts.get("category", {}).items():
+        category = tree.by_id.get(int(category_id))
+        if category is None:
+            continue
+        for node in tree.ancestors(category) + [category]:
+            category_counts[node.pk] = category_counts.get(node.pk, 0) + count
+    current = tree.get(params.get("category", ""))
+    choices = current.subcategories if current else tree.roots
+    options = []
+    if current:
+        parent = tree.by_id.get(current.parent_id)
+        options.append({
+            "label": f"All {parent.name}" if parent else "All categories",
+            "count": None,
+            "url": _link(params, category=parent.slug if parent else None),
+            "selected": False,
+        })
+    options += [
+        {"label": category.name, "count": category_counts[category.pk],
+         "url": _link(params, category=category.slug), "selected": False}
+        for category in choices if category_counts.get(category.pk)
+    ]
+    facets.append({"label": current.name if current else "Category", "options": options})
+
+    edges = price_edges()
+    options = []
+    for position in range(len(edges) + 1):
+        count = counts.get("price", {}).get(str(position))
+        if not count:
+            continue
+        low = edges[position - 1] if position else 0
+        high = edges[position] if position < len(edges) else None
+        low_param = str(low)
+        high_param = str(Decimal(high) - Decimal("0.01")) if high else None
+        selected = params.get("min_price") == low_param and params.get("max_price") == high_param
+        options.append({
+            "label": f"{_money(low)} – {_money(high)}" if high else f"{_money(low)} and up",
+            "count": count,
+            "url": _link(params, min_price=None if selected else low_param, max_price=None if selected else high_param),
+            "selected": selected,
+        })
+    facets.append({"label": "Price", "options": options})
+
+    options = []
+    running = 0
+    rating_counts = counts.get("rating", {})
+    for rating in RATINGS:
+        running += rating_counts.get(str(rating), 0)
+        if running:
+            selected = params.get("min_rating") == str(rating)
+            options.append({
+                "label": f"{rating}★ & up", "count": running,
+                "url": _link(params, min_rating=None if selected else rating), "selected": selected,
+            })
+    facets.append({"label": "Rating", "options": options})
+
+    for name, label in (("size", "Size"), ("color", "Colour")):
+        options = [
+            {"label": value, "count": count, "selected": params.get(name) == value,
+             "url": _link(params, **{name: None if params.get(name) == value else value})}
+            for value, count in sorted(counts.get(name, {}).items())
+        ]
+        facets.append({"label": label, "options": options})
+
+    stocked = counts.get("in_stock", {}).get("1", 0)
+    selected = bool(params.get("in_stock"))
+    facets.append({"label": "Availability", "options": [{
+        "label": "In stock", "count": stocked, "url": _link(params, in_stock=None if selected else "1"),
+        "selected": selected,
+    }] if stocked else []})
+
+    return [facet for facet in facets if facet["options"]]
@@ -1,18 +1,35 @@
-from .models import Product
+from django.db.models import Exists, OuterRef
+from .category_tree import find_category
+from .models import Product, ProductVariant
 
 def filter_products(queryset, params):
     category_slug = params.get("category")
     min_price = params.get("min_price")
     max_price = params.get("max_price")
     min_rating = params.get("min_rating")
+    in_stock = params.get("in_stock")
+    size = params.get("size")
+    color = params.get("color")
 
     if category_slug:
-        queryset = queryset.filter(category__slug=category_slug)
+        # The category and everything below it.
+        category = find_category(category_slug)
+        queryset = queryset.in_category(category) if category else queryset.none()
     if min_price:
-        queryset = queryset.filter(base_price__gte=min_price)
+        queryset = queryset.filter(min_price__gte=min_price)
     if max_price:
-        queryset = queryset.filter(base_price__lte=max_price)
+        queryset = queryset.filter(min_price__lte=max_price)
     if min_rating:
         queryset = queryset.filter(rating__gte=min_rating)
+    if in_stock:
+        queryset = queryset.filter(in_stock=True)
+    if size or color:
+        # Any variant in that size/colour; EXISTS keeps one row per product.
+        variants = ProductVariant.objects.filter(product=OuterRef("pk"))
+        if size:
+            variants = variants.filter(size=size)
+        if color:
+            variants = variants.filter(color=color)
+        queryset = queryset.filter(Exists(variants))
 
     return queryset
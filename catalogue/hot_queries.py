@@ -0,0 +1,64 @@
+from core.query_plans import hot_query
+from .facets import facet_union
+from .filters import filter_products
+from .models import Category, Product, ProductRecommendation
+from .pagination import NEWEST, TOP_RATED
+from .search import search_products
+
+
+@hot_query("catalogue:product_list")
+def product_list():
+    return Product.objects.filter(is_active=True).order_by(*NEWEST)[:50]
+
+
+@hot_query("catalogue:product_list_filtered")
+def product_list_filtered():
+    products = filter_products(Product.objects.filter(is_active=True), {"min_price": "10", "max_price": "100"})
+    return products.in_category(Category(path="/1/")).order_by(*NEWEST)[:50]
+
+
+@hot_query("catalogue:product_detail")
+def product_detail():
+    return Product.objects.filter(slug="leather-boot", is_active=True)
+
+
+@hot_query("catalogue:search", allow_scan=("catalogue_category",))
+def search():
+    return search_products(Product.objects.filter(is_active=True), "leather boot")[:50]
+
+
+@hot_query("catalogue:category_tree", allow_scan=("catalogue_category",))
+def category_tree():
+    # Loaded whole into the in-process tree, and only when a category changes.
+    return Category.objects.all()
+
+
+@hot_query("catalogue:category_subtree")
+def category_subtree():
+    return Product.objects.filter(is_active=True).in_category(Category(path="/1/")).order_by(*NEWEST)[:50]
+
+
+@hot_query("core:home_featured")
+def home_featured():
+    return Product.objects.filter(is_featured=True, is_active=True).order_by(*TOP_RATED)[:8]
+
+
+@hot_query("core:home_top_rated")
+def home_top_rated():
+    return Product.objects.filter(is_active=True).order_by(*TOP_RATED)[:8]
+
+
+@hot_query("core:featured_categories")
+def featured_categories():
+    return Category.objects.filter(is_featured=True)[:6]
+
+
+@hot_query("catalogue:product_recommendations")
+def product_recommendations():
+    return ProductRecommendation.objects.filter(product_id=1, recommended__is_active=True).select_related("recommended")
+
+
+@hot_query("catalogue:facet_counts")
+def facet_counts():
+    products = filter_products(Product.objects.filter(is_active=True), {"min_price": "10", "max_price": "100"})
+    return facet_union(products)
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from catalogue.recommendations import refresh
+
+
+class Command(BaseCommand):
+    help = "Refresh the precomputed related and frequently-bought-together product lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recount every paid order instead of the queued products.")
+        parser.add_argument("--chunk-size", type=int, default=20000, help="Orders read per chunk.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuilt = refresh(full=options["full"], chunk_size=options["chunk_size"])
+        scope = "all products" if rebuilt is None else f"{rebuilt} queued products"
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt recommendations for {scope} in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from catalogue import thumbnails
+from catalogue.models import ProductImage
+from core.page_cache import bump_catalogue_version
+
+
+def generate_or_error(name):
+    try:
+        return thumbnails.generate(name)
+    except Exception as exc:
+        return exc
+
+
+class Command(BaseCommand):
+    help = "Generate responsive thumbnails for product images, in parallel across cores."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--force", action="store_true", help="Regenerate images that already have thumbnails.")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.exclude(image="").only("id", "image", "thumbnails").order_by("id")
+        batch_size = options["batch_size"]
+        pool = ProcessPoolExecutor(max_workers=options["workers"]) if options["workers"] > 1 else None
+
+        started = time.monotonic()
+        done = failed = 0
+        try:
+            batch = []
+            for image in images.iterator(chunk_size=batch_size):
+                if options["force"] or image.thumbnails_stale:
+                    batch.append(image)
+                if len(batch) == batch_size:
+                    ok, bad = self.process(batch, pool)
+                    done, failed, batch = done + ok, failed + bad, []
+            if batch:
+                ok, bad = self.process(batch, pool)
+                done, failed = done + ok, failed + bad
+        finally:
+            if pool:
+                pool.shutdown()
+
+        if done:
+            bump_catalogue_version()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated thumbnails for {done} images in {elapsed:.1f}s ({failed} failed)."
+        ))
+
+    def process(self, batch, pool):
+        names = [image.image.name for image in batch]
+        results = pool.map(generate_or_error, names) if pool else map(generate_or_error, names)
+
+        updated = []
+        for image, result in zip(batch, results):
+            if isinstance(result, Exception):
+                self.stderr.write(f"{image.image.name}: {result}")
+                continue
+            image.thumbnails = result
+            updated.append(image)
+        ProductImage.objects.bulk_update(updated, ["thumbnails"])
+        return len(updated), len(batch) - len(updated)
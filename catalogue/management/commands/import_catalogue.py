@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from catalogue.bulk_io import import_catalogue, read_rows
+
+
+class Command(BaseCommand):
+    help = "Upsert categories, products and variants from a CSV or XLSX file (see catalogue.bulk_io.HEADER)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("csv", "xlsx"), help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(f"{result.rows} rows, {result.rate:.0f} rows/s")
+
+        try:
+            rows = read_rows(options["path"], options["format"])
+            result = import_catalogue(rows, options["batch_size"], progress if options["verbosity"] > 1 else None)
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.rows} rows ({result.products} products, {result.variants} variants, "
+            f"{result.categories} categories) in {result.elapsed:.1f}s, {result.rate:.0f} rows/s; "
+            f"{result.error_count} rows skipped."
+        ))
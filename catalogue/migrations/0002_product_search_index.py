@@ -0,0 +1,43 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS catalogue_product_fts USING fts5("
+    "name, category, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO catalogue_product_fts (rowid, name, category, description) "
+    "SELECT p.id, p.name, c.name, p.description FROM catalogue_product p "
+    "JOIN catalogue_category c ON c.id = p.category_id",
+]
+POSTGRES_FORWARD = [
+    "CREATE TABLE IF NOT EXISTS catalogue_product_fts ("
+    "product_id bigint PRIMARY KEY REFERENCES catalogue_product (id) ON DELETE CASCADE "
+    "DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS catalogue_product_fts_document ON catalogue_product_fts USING GIN (document)",
+    "INSERT INTO catalogue_product_fts (product_id, document) "
+    "SELECT p.id, setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(p.description, '')), 'C') "
+    "FROM catalogue_product p JOIN catalogue_category c ON c.id = p.category_id",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute("DROP TABLE IF EXISTS catalogue_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
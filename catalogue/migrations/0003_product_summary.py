@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+from django.db.models import Exists, F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_summary(apps, schema_editor):
+    Product = apps.get_model("catalogue", "Product")
+    ProductVariant = apps.get_model("catalogue", "ProductVariant")
+    variants = ProductVariant.objects.filter(product=OuterRef("pk")).order_by().values("product")
+
+    def per_product(aggregate):
+        return Subquery(variants.annotate(value=aggregate).values("value"))
+
+    Product.objects.update(
+        min_price=F("base_price") + Coalesce(per_product(Min("price_adjustment")), Value(0), output_field=models.DecimalField()),
+        max_price=F("base_price") + Coalesce(per_product(Max("price_adjustment")), Value(0), output_field=models.DecimalField()),
+        total_stock=Coalesce(per_product(Sum("stock")), Value(0)),
+        in_stock=Exists(ProductVariant.objects.filter(product=OuterRef("pk"), stock__gt=0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0002_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='in_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    Category = apps.get_model("catalogue", "Category")
+    parents = {None: "/"}
+    level = list(Category.objects.filter(parent__isnull=True).values_list("id", "parent_id"))
+    depth = 0
+    while level:
+        paths = {pk: f"{parents[parent_id]}{pk}/" for pk, parent_id in level}
+        for pk, path in paths.items():
+            Category.objects.filter(pk=pk).update(path=path, depth=depth)
+        parents = paths
+        level = list(Category.objects.filter(parent_id__in=paths).values_list("id", "parent_id"))
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0006_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,16 @@
 import uuid
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Exists, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Substr
 from django.utils.text import slugify
 
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, path):
+        """Categories at or below ``path``, as an index range scan rather than a LIKE."""
+        return self.filter(path__gte=path, path__lt=path + "~")
+
+
 class Category(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
@@ -11,12 +20,90 @@ class Category(models.Model):
     icon = models.CharField(max_length=100, blank=True, help_text="Bootstrap icon class, e.g. bi bi-tv")
     is_featured = models.BooleanField(default=False)
 
+    # Materialised path of ids from the root, e.g. "/3/17/", kept up to date by save().
+    path = models.CharField(max_length=255, db_index=True, editable=False, default="")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            models.Index(fields=["id"], condition=Q(is_featured=True), name="catalogue_category_feat_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or ""
+            if self.parent_id == self.pk or (self.path and parent_path.startswith(self.path)):
+                raise ValidationError({"parent": "A category cannot be moved under itself."})
+
+    def save(self, *args, **kwargs):
+        parent_path = "/"
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).get() or "/"
+            if self.path and parent_path.startswith(self.path):
+                raise ValueError("A category cannot be moved under itself.")
+        super().save(*args, **kwargs)
+
+        path = f"{parent_path}{self.pk}/"
+        if path == self.path:
+            return
+
+        old_path, self.path, self.depth = self.path, path, path.count("/") - 2
+        Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+        if old_path:
+            # Re-root the whole subtree with one UPDATE.
+            Category.objects.subtree(old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr("path", len(old_path) + 1)),
+                depth=F("depth") + (self.depth - (old_path.count("/") - 2)),
+            )
+
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every path from the parent links, one UPDATE per level; for bulk writes that skip save()."""
+        parents = {None: "/"}
+        level = list(cls.objects.filter(parent__isnull=True).values_list("id", "parent_id"))
+        depth = 0
+        while level:
+            paths = {pk: f"{parents[parent_id]}{pk}/" for pk, parent_id in level}
+            cls.objects.filter(pk__in=paths).update(
+                path=models.Case(*[models.When(pk=pk, then=Value(path)) for pk, path in paths.items()]),
+                depth=depth,
+            )
+            parents = paths
+            level = list(cls.objects.filter(parent_id__in=paths).values_list("id", "parent_id"))
+            depth += 1
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Everything product_card.html reads, fetched in a constant number of queries."""
+        return self.select_related("category").prefetch_related(
+            models.Prefetch("images", queryset=ProductImage.objects.order_by("-is_main", "id")),
+        )
+
+    def in_category(self, category):
+        """Products in ``category`` or any of its subcategories, through the category path index."""
+        return self.filter(category__path__gte=category.path, category__path__lt=category.path + "~")
+
+    def refresh_summary(self):
+        """Recompute the denormalised price/stock columns of these products in one UPDATE."""
+        variants = ProductVariant.objects.filter(product=OuterRef("pk")).order_by().values("product")
+
+        def per_product(aggregate):
+            return Subquery(variants.annotate(value=aggregate).values("value"))
+
+        return self.update(
+            min_price=F("base_price") + Coalesce(per_product(Min("price_adjustment")), Value(0), output_field=models.DecimalField()),
+            max_price=F("base_price") + Coalesce(per_product(Max("price_adjustment")), Value(0), output_field=models.DecimalField()),
+            total_stock=Coalesce(per_product(Sum("stock")), Value(0)),
+            in_stock=Exists(ProductVariant.objects.filter(product=OuterRef("pk"), stock__gt=0)),
+        )
+
 
 class Product(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -31,6 +118,32 @@ class Product(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalised from the variants by ProductQuerySet.refresh_summary(); see catalogue.signals.
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    total_stock = models.PositiveIntegerField(default=0, editable=False)
+    in_stock = models.BooleanField(default=False, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        # Partial indexes: the listings only ever read active products, and a
+        # bare boolean column in WHERE cannot be seeked in a composite index.
+        indexes = [
+            models.Index(fields=["min_price"], condition=Q(is_active=True), name="catalogue_product_price_idx"),
+            models.Index(
+                fields=["min_price"], condition=Q(is_active=True, in_stock=True), name="catalogue_product_stock_idx"
+            ),
+            models.Index(
+                fields=["rating"], condition=Q(is_active=True, is_featured=True), name="catalogue_product_feat_idx"
+            ),
+            models.Index(fields=["rating"], condition=Q(is_active=True), name="catalogue_product_rating_idx"),
+            models.Index(
+                fields=["category", "min_price"], condition=Q(is_active=True), name="catalogue_product_cat_idx"
+            ),
+            models.Index(fields=["created_at"], condition=Q(is_active=True), name="catalogue_product_newest_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -39,6 +152,11 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def main_image(self):
+        images = list(self.images.all())
+        return next((image for image in images if image.is_main), images[0] if images else None)
+
 
 class ProductVariant(models.Model):
     product = models.ForeignKey(Product, related_name="variants", on_delete=models.CASCADE)
@@ -62,6 +180,60 @@ class ProductImage(models.Model):
     image = models.ImageField(upload_to="products/")
     alt_text = models.CharField(max_length=255, blank=True)
     is_main = models.BooleanField(default=False)
+    # {"source": image name, format: [widths]} for the copies written by catalogue.thumbnails.
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.name}"
+
+    @property
+    def source_sets(self):
+        """(content type, srcset) pairs for the <source> elements, best format first."""
+        from .thumbnails import CONTENT_TYPES, srcset
+
+        return [
+            (CONTENT_TYPES[fmt], srcset(self.image.name, self.thumbnails, fmt))
+            for fmt in CONTENT_TYPES if fmt != "jpeg" and fmt in self.thumbnails
+        ]
+
+    @property
+    def thumbnails_stale(self):
+        return bool(self.image) and self.thumbnails.get("source") != self.image.name
+
+    @property
+    def jpeg_srcset(self):
+        from .thumbnails import srcset
+
+        return srcset(self.image.name, self.thumbnails, "jpeg")
+
+
+class ProductRecommendation(models.Model):
+    """Top-K neighbours of a product, precomputed by catalogue.recommendations."""
+
+    BOUGHT_TOGETHER = "bought_together"
+    RELATED = "related"
+    KIND_CHOICES = [
+        (BOUGHT_TOGETHER, "Frequently bought together"),
+        (RELATED, "Related"),
+    ]
+
+    product = models.ForeignKey(Product, related_name="recommendations", on_delete=models.CASCADE)
+    recommended = models.ForeignKey(Product, related_name="+", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["kind", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "kind", "rank"], name="catalogue_recommendation_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} ({self.kind} #{self.rank})"
+
+
+class StaleRecommendation(models.Model):
+    """Products whose bought-together neighbours changed since the last refresh."""
+
+    product = models.OneToOneField(Product, primary_key=True, related_name="+", on_delete=models.CASCADE)
@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import json
+import math
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEWEST = ("-created_at", "-id")
+TOP_RATED = ("-rating", "-id")
+
+
+def cached_count(queryset):
+    """COUNT(*) for ``queryset``, memoised in the cache for CATALOGUE_COUNT_CACHE_TIMEOUT seconds."""
+    timeout = getattr(settings, "CATALOGUE_COUNT_CACHE_TIMEOUT", 60)
+    if not timeout:
+        return queryset.count()
+    try:
+        sql = str(queryset.query)
+    except Exception:
+        return queryset.count()
+    key = "catalogue:count:" + hashlib.md5(sql.encode("utf-8")).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({"v": values, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return payload["v"], payload["d"]
+    except (ValueError, TypeError, KeyError):
+        return None, None
+
+
+def _cursor_values(model, keys, values):
+    """
+    The decoded cursor ``values`` converted by each key field's ``to_python()``.
+    Raises ValueError, TypeError or ValidationError for tokens that don't fit ``keys``.
+    """
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Cursor does not match the ordering.")
+    values = [model._meta.get_field(key.lstrip("-")).to_python(value) for key, value in zip(keys, values)]
+    if None in values:
+        raise ValueError("Cursor values cannot be null.")
+    return values
+
+
+def _seek(keys, values, forward):
+    """
+    WHERE clause selecting the rows after ``values`` in ``keys`` order
+    (or before them when ``forward`` is False).
+    """
+    condition = Q()
+    for position in reversed(range(len(keys))):
+        key = keys[position]
+        field = key.lstrip("-")
+        descending = key.startswith("-") == forward
+        step = Q(**{f"{field}__{'lt' if descending else 'gt'}": values[position]})
+        if position < len(keys) - 1:
+            step |= Q(**{field: values[position]}) & condition
+        condition = step
+    return condition
+
+
+class CursorPaginator:
+    def __init__(self, object_list, per_page, count):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.count = count
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+
+class CursorPage:
+    """
+    One page of a keyset-paginated listing. Exposes the parts of Django's
+    Page that the listing templates use, plus opaque next/previous tokens.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def cursor_page(queryset, per_page, keys, token=""):
+    values, direction = decode_cursor(token) if token else (None, None)
+    if values is not None:
+        # A forged or stale token starts over at the first page.
+        try:
+            values = _cursor_values(queryset.model, keys, values)
+        except (ValidationError, TypeError, ValueError):
+            values, direction = None, None
+    forward = direction != "p"
+
+    ordering = keys if forward else tuple(k[1:] if k.startswith("-") else "-" + k for k in keys)
+    rows = queryset.order_by(*ordering)
+    if values is not None:
+        rows = rows.filter(_seek(keys, values, forward))
+    rows = list(rows[:per_page + 1])
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def key_values(obj):
+        values = [getattr(obj, key.lstrip("-")) for key in keys]
+        return [value.isoformat() if hasattr(value, "isoformat") else str(value) for value in values]
+
+    has_next = more if forward else values is not None
+    has_previous = values is not None if forward else more
+    next_cursor = encode_cursor(key_values(rows[-1]), "n") if rows and has_next else None
+    previous_cursor = encode_cursor(key_values(rows[0]), "p") if rows and has_previous else None
+
+    paginator = CursorPaginator(queryset, per_page, cached_count(queryset))
+    return CursorPage(rows, paginator, next_cursor, previous_cursor)
+
+
+def paginate(request, queryset, per_page, keys, page_param="page", cursor_param="cursor"):
+    """
+    Paginate a listing ordered by ``keys``. Uses keyset pagination when the
+    request carries ``cursor_param`` or CATALOGUE_PAGINATION is "cursor",
+    and numbered pages with a cached total count otherwise. With ``keys=None``
+    the queryset keeps its own ordering (e.g. search relevance, which no
+    keyset can follow) and is always paginated by number.
+    """
+    if keys is not None:
+        if cursor_param in request.GET or getattr(settings, "CATALOGUE_PAGINATION", "offset") == "cursor":
+            return cursor_page(queryset, per_page, keys, request.GET.get(cursor_param, ""))
+        queryset = queryset.order_by(*keys)
+
+    paginator = CachedCountPaginator(queryset, per_page)
+    page = request.GET.get(page_param)
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
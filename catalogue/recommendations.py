@@ -0,0 +1,186 @@
+from itertools import groupby, islice
+from django.conf import settings
+from django.db import transaction
+import numpy as np
+from core.page_cache import bump_catalogue_version
+from .models import Product, ProductRecommendation, StaleRecommendation
+
+BOUGHT_TOGETHER = ProductRecommendation.BOUGHT_TOGETHER
+RELATED = ProductRecommendation.RELATED
+# Orders with more distinct products than this add n² pairs and say little about affinity.
+MAX_BASKET = 50
+
+
+def top_k():
+    return getattr(settings, "CATALOGUE_RECOMMENDATIONS", 8)
+
+
+def mark_stale(product_ids):
+    StaleRecommendation.objects.bulk_create(
+        [StaleRecommendation(product_id=product_id) for product_id in set(product_ids)], ignore_conflicts=True
+    )
+
+
+def _basket_pairs(order_ids, product_ids):
+    """
+    Every ordered (a, b) pair of distinct products sharing an order, as two
+    arrays. Input rows are distinct (order, product) pairs sorted by order.
+    """
+    starts = np.flatnonzero(np.r_[True, order_ids[1:] != order_ids[:-1]])
+    sizes = np.diff(np.r_[starts, len(order_ids)])
+    keep = (sizes > 1) & (sizes <= MAX_BASKET)
+    starts, sizes = starts[keep], sizes[keep]
+    if not len(starts):
+        return product_ids[:0], product_ids[:0]
+
+    # Pair each item of a basket with every item of the same basket, vectorised.
+    item_start = np.repeat(starts, sizes)
+    item_size = np.repeat(sizes, sizes)
+    items = item_start + np.arange(len(item_start)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    left = np.repeat(items, item_size)
+    right = np.repeat(item_start, item_size) + (
+        np.arange(len(left)) - np.repeat(np.cumsum(item_size) - item_size, item_size)
+    )
+    distinct = left != right
+    return product_ids[left[distinct]], product_ids[right[distinct]]
+
+
+def _merge(keys, counts, new_keys, new_counts):
+    keys = np.concatenate([keys, new_keys])
+    counts = np.concatenate([counts, new_counts])
+    keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(totals, inverse.reshape(-1), counts)
+    return keys, totals
+
+
+def count_pairs(orders, only=None, chunk_size=20000):
+    """
+    Co-occurrence counts over ``orders``, as sorted ``(a << 32 | b)`` keys
+    and their counts. Orders are read in id-keyset chunks of ``chunk_size``
+    and each chunk is reduced with NumPy before being merged, so memory is
+    bounded by the number of distinct pairs. ``only`` restricts the left
+    side of the pairs to those product ids.
+    """
+    from orders.models import OrderItem
+
+    keys = np.zeros(0, dtype=np.int64)
+    counts = np.zeros(0, dtype=np.int64)
+    only = np.array(sorted(only), dtype=np.int64) if only is not None else None
+    orders = orders.order_by("id").values_list("id", flat=True)
+    last_id = 0
+    while True:
+        chunk = list(orders.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        rows = (
+            OrderItem.objects.filter(order_id__in=chunk)
+            .values_list("order_id", "variant__product_id").distinct().order_by("order_id", "variant__product_id")
+        )
+        rows = np.array(list(rows), dtype=np.int64).reshape(-1, 2)
+        left, right = _basket_pairs(rows[:, 0], rows[:, 1])
+        if only is not None:
+            wanted = np.isin(left, only)
+            left, right = left[wanted], right[wanted]
+        new_keys, new_counts = np.unique((left << 32) | right, return_counts=True)
+        keys, counts = _merge(keys, counts, new_keys, new_counts)
+    return keys, counts
+
+
+def _top(products, neighbours, scores, limit):
+    """Best ``limit`` neighbours per product: rows of (product, neighbour, rank, score)."""
+    order = np.lexsort((neighbours, -scores, products))
+    products, neighbours, scores = products[order], neighbours[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, products[1:] != products[:-1]])
+    ranks = np.arange(len(products)) - np.repeat(starts, np.diff(np.r_[starts, len(products)]))
+    keep = ranks < limit
+    return zip(products[keep].tolist(), neighbours[keep].tolist(), ranks[keep].tolist(), scores[keep].tolist())
+
+
+def _replace(kind, rows, product_ids=None):
+    with transaction.atomic():
+        existing = ProductRecommendation.objects.filter(kind=kind)
+        if product_ids is not None:
+            existing = existing.filter(product_id__in=product_ids)
+        existing.delete()
+        rows = iter(rows)
+        while batch := list(islice(rows, 2000)):
+            ProductRecommendation.objects.bulk_create([
+                ProductRecommendation(product_id=product, recommended_id=neighbour, kind=kind, rank=rank, score=score)
+                for product, neighbour, rank, score in batch
+            ])
+
+
+def build_bought_together(product_ids=None, chunk_size=20000):
+    """
+    Rank products by how many paid orders they shared. With ``product_ids``
+    only those products' lists are rebuilt, from the orders containing them;
+    a pair's count only moves when an order holds both products, so that is
+    all an incremental refresh needs to revisit.
+    """
+    from orders.models import Order
+
+    orders = Order.objects.filter(status="paid")
+    if product_ids is not None:
+        orders = orders.filter(items__variant__product_id__in=product_ids).distinct()
+    keys, counts = count_pairs(orders, product_ids, chunk_size)
+    rows = _top(keys >> 32, keys & 0xFFFFFFFF, counts.astype(np.float64), top_k())
+    _replace(BOUGHT_TOGETHER, rows, product_ids)
+
+
+def _related_rows(limit):
+    products = (
+        Product.objects.filter(is_active=True).order_by("category_id", "min_price", "id")
+        .values_list("category_id", "id", "min_price", "base_price", "rating")
+    )
+    for category_id, rows in groupby(products.iterator(chunk_size=5000), key=lambda row: row[0]):
+        rows = list(rows)
+        if len(rows) < 2:
+            continue
+        ids = np.array([row[1] for row in rows], dtype=np.int64)
+        prices = np.array([float(row[2] if row[2] is not None else row[3]) for row in rows])
+        ratings = np.array([float(row[4]) for row in rows])
+
+        left, right = [], []
+        for offset in range(1, min(limit, len(ids) - 1) + 1):
+            left += [np.arange(len(ids) - offset), np.arange(offset, len(ids))]
+            right += [np.arange(offset, len(ids)), np.arange(len(ids) - offset)]
+        left, right = np.concatenate(left), np.concatenate(right)
+        highest = np.maximum(np.maximum(prices[left], prices[right]), 0.01)
+        scores = 1 - np.abs(prices[left] - prices[right]) / highest + 0.1 * ratings[right] / 5
+        yield from _top(ids[left], ids[right], scores, limit)
+
+
+def build_related():
+    """
+    Same-category neighbours, scored by price similarity with a small nudge
+    for rating. Products are streamed in category and price order, so only
+    the ``top_k`` on either side of a product are candidates.
+    """
+    _replace(RELATED, _related_rows(top_k()))
+
+
+def refresh(full=False, chunk_size=20000):
+    """
+    Bring the recommendation table up to date. Bought-together lists are
+    rebuilt only for products queued by mark_stale() unless ``full`` is set
+    or nothing has been built yet; related lists are cheap and always rebuilt.
+    Returns the number of products whose bought-together lists were rebuilt,
+    or None after a full rebuild.
+    """
+    stale = list(StaleRecommendation.objects.values_list("product_id", flat=True))
+    built = ProductRecommendation.objects.filter(kind=BOUGHT_TOGETHER).exists()
+    if full or not built:
+        StaleRecommendation.objects.all().delete()
+        build_bought_together(chunk_size=chunk_size)
+        rebuilt = None
+    else:
+        if stale:
+            # Claim the queue first: products marked while this runs stay queued for the next refresh.
+            StaleRecommendation.objects.filter(product_id__in=stale).delete()
+            build_bought_together(stale, chunk_size)
+        rebuilt = len(stale)
+    build_related()
+    bump_catalogue_version()
+    return rebuilt
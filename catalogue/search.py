@@ -0,0 +1,152 @@
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = "catalogue_product_fts"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Column weights: a hit in the name outranks the category, which outranks the description.
+SQLITE_RANK = f"bm25({SEARCH_TABLE}, 10.0, 5.0, 1.0)"
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(p.description, '')), 'C')"
+)
+
+
+def is_supported():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def _tokens(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def _match_expression(tokens):
+    # Every term must match; the last one is treated as a prefix so partial words still hit.
+    if connection.vendor == "sqlite":
+        terms = ['"%s"' % token for token in tokens]
+        terms[-1] += "*"
+        return " ".join(terms)
+    terms = list(tokens)
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def search_products(queryset, query):
+    """
+    Restrict ``queryset`` to products matching ``query`` and order them by relevance.
+    Falls back to the old icontains scan on backends without a search index.
+    """
+    tokens = _tokens(query)
+    if not tokens or not is_supported():
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).order_by("-rating", "id")
+
+    match = _match_expression(tokens)
+    table = queryset.model._meta.db_table
+    if connection.vendor == "sqlite":
+        ids = RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", (match,))
+        rank = RawSQL(
+            f"SELECT {SQLITE_RANK} FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND rowid = {table}.id",
+            (match,),
+        )
+        ordering = ("search_rank", "-rating", "id")
+    else:
+        ids = RawSQL(
+            f"SELECT product_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+            (match,),
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank_cd(document, to_tsquery('simple', %s)) FROM {SEARCH_TABLE} "
+            f"WHERE product_id = {table}.id",
+            (match,),
+        )
+        ordering = ("-search_rank", "-rating", "id")
+
+    return queryset.filter(id__in=ids).annotate(search_rank=rank).order_by(*ordering)
+
+
+def _sqlite_index(where="", params=()):
+    with connection.cursor() as cursor:
+        if where:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+                f"(SELECT p.id FROM catalogue_product p WHERE {where})",
+                params,
+            )
+        else:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, category, description) "
+            f"SELECT p.id, p.name, c.name, p.description FROM catalogue_product p "
+            f"JOIN catalogue_category c ON c.id = p.category_id"
+            + (f" WHERE {where}" if where else ""),
+            params,
+        )
+
+
+def _postgres_index(where="", params=()):
+    with connection.cursor() as cursor:
+        if not where:
+            cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, document) "
+            f"SELECT p.id, {POSTGRES_DOCUMENT} FROM catalogue_product p "
+            f"JOIN catalogue_category c ON c.id = p.category_id"
+            + (f" WHERE {where}" if where else "")
+            + " ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            params,
+        )
+
+
+def _index(where="", params=()):
+    if connection.vendor == "sqlite":
+        _sqlite_index(where, params)
+    elif connection.vendor == "postgresql":
+        _postgres_index(where, params)
+
+
+def index_product(product_id):
+    _index("p.id = %s", (product_id,))
+
+
+def index_category(category_id):
+    _index("p.category_id = %s", (category_id,))
+
+
+def _placeholders(ids):
+    return ", ".join(["%s"] * len(ids))
+
+
+def index_products(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        _index(f"p.id IN ({_placeholders(product_ids)})", product_ids)
+
+
+def index_categories(category_ids):
+    category_ids = list(category_ids)
+    if category_ids:
+        _index(f"p.category_id IN ({_placeholders(category_ids)})", category_ids)
+
+
+def remove_product(product_id):
+    if not is_supported():
+        return
+    column = "rowid" if connection.vendor == "sqlite" else "product_id"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} = %s", (product_id,))
+
+
+def rebuild_index():
+    """Repopulate the whole index with one INSERT ... SELECT."""
+    _index()
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
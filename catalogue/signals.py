@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import category_tree, search, thumbnails
+from .autocomplete import product_index
+from .models import Category, Product, ProductImage, ProductVariant
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_product(instance.pk)
+        product_index.update(instance)
+        Product.objects.filter(pk=instance.pk).refresh_summary()
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+    product_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, raw=False, **kwargs):
+    if not raw:
+        category_tree.bump_version()
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_category(instance.pk)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_product_summary(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).refresh_summary()
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw and instance.thumbnails_stale:
+        image_id, name = instance.pk, instance.image.name
+        transaction.on_commit(lambda: thumbnails.schedule(image_id, name))
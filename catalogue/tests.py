@@ -1,3 +1,683 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from itertools import count as counter
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image as PILImage
+from .autocomplete import VERSION_KEY, product_index
+from .bulk_io import HEADER, import_catalogue, read_rows
+from .category_tree import VERSION_KEY as TREE_VERSION_KEY, category_tree
+from .facets import build_facets, count_facets
+from .filters import filter_products
+from .models import Category, Product, ProductImage, ProductRecommendation, ProductVariant, StaleRecommendation
+from .pagination import TOP_RATED, cursor_page, encode_cursor
+from .recommendations import refresh as refresh_recommendations
+from .search import SEARCH_TABLE, search_products
+from .thumbnails import derivative_name
 
-# Create your tests here.
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name="Shoes", slug="shoes")
+        cls.jackets = Category.objects.create(name="Jackets", slug="jackets")
+        cls.boot = Product.objects.create(
+            category=cls.shoes, name="Leather Boot", base_price=100,
+            description="Classic leather boot with a rubber sole.",
+        )
+        cls.sneaker = Product.objects.create(
+            category=cls.shoes, name="Canvas Sneaker", base_price=50,
+            description="Goes well with a leather jacket.",
+        )
+        cls.bomber = Product.objects.create(
+            category=cls.jackets, name="Bomber", base_price=150,
+            description="Nylon bomber.",
+        )
+
+    def search(self, query):
+        return list(search_products(Product.objects.filter(is_active=True), query))
+
+    def test_matches_name_description_and_category(self):
+        self.assertEqual(self.search("bomber"), [self.bomber])
+        self.assertEqual(self.search("rubber"), [self.boot])
+        self.assertCountEqual(self.search("shoes"), [self.boot, self.sneaker])
+
+    def test_ranks_name_hits_above_description_hits(self):
+        self.assertEqual(self.search("leather"), [self.boot, self.sneaker])
+
+    def test_last_term_matches_as_prefix(self):
+        self.assertEqual(self.search("canvas snea"), [self.sneaker])
+
+    def test_index_follows_product_and_category_changes(self):
+        self.bomber.name = "Varsity"
+        self.bomber.save()
+        self.assertEqual(self.search("varsity"), [self.bomber])
+        self.assertEqual(self.search("bomber"), [self.bomber])  # still in the description
+
+        self.jackets.name = "Outerwear"
+        self.jackets.save()
+        self.assertEqual(self.search("outerwear"), [self.bomber])
+
+        self.bomber.delete()
+        self.assertEqual(self.search("varsity"), [])
+
+    def test_rebuild_command_repopulates_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        self.assertEqual(self.search("bomber"), [])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("bomber"), [self.bomber])
+
+    def test_search_view(self):
+        response = self.client.get(reverse("catalogue:search"), {"q": "boot"})
+        self.assertEqual(list(response.context["products"]), [self.boot])
+
+    @override_settings(CATALOGUE_PAGINATION="cursor")
+    def test_search_view_keeps_relevance_order(self):
+        Product.objects.filter(pk=self.sneaker.pk).update(rating=5)
+        response = self.client.get(reverse("catalogue:search"), {"q": "leather"})
+        self.assertEqual(list(response.context["products"]), [self.boot, self.sneaker])
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Shoes", slug="shoes")
+        cls.boot = Product.objects.create(category=cls.category, name="Leather Boot", base_price=100)
+        cls.loafer = Product.objects.create(category=cls.category, name="Suede Loafer", base_price=80)
+        Product.objects.create(category=cls.category, name="Hidden Boot", base_price=10, is_active=False)
+
+    def setUp(self):
+        product_index.clear()
+        self.addCleanup(product_index.clear)
+
+    def autocomplete(self, query):
+        response = self.client.get(reverse("catalogue:search_autocomplete"), {"q": query})
+        return response.json()["results"]
+
+    def test_cold_index_falls_back_to_database(self):
+        with mock.patch.object(product_index, "warm_async") as warm:
+            self.assertEqual(self.autocomplete("boot"), [{"name": "Leather Boot", "slug": "leather-boot"}])
+        warm.assert_called_once()
+
+    def test_fallback_matches_word_prefixes_like_the_index(self):
+        with mock.patch.object(product_index, "warm_async"):
+            cold = [self.autocomplete(query) for query in ("suede loa", "eather", "suede boot")]
+        product_index.build()
+        self.assertEqual([self.autocomplete(query) for query in ("suede loa", "eather", "suede boot")], cold)
+        self.assertEqual(cold, [[{"name": "Suede Loafer", "slug": "suede-loafer"}], [], []])
+
+    def test_warm_index_answers_without_queries(self):
+        product_index.build()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.autocomplete("bo"), [{"name": "Leather Boot", "slug": "leather-boot"}])
+            self.assertEqual(self.autocomplete("suede loa"), [{"name": "Suede Loafer", "slug": "suede-loafer"}])
+            self.assertEqual(self.autocomplete("suede boot"), [])
+
+    def test_limits_results_to_eight(self):
+        for i in range(10):
+            Product.objects.create(category=self.category, name=f"Boot {i}", base_price=1)
+        product_index.build()
+        self.assertEqual(len(self.autocomplete("boot")), 8)
+
+    def test_signals_keep_index_in_sync(self):
+        product_index.build()
+        self.boot.name = "Leather Chelsea"
+        self.boot.save()
+        self.assertEqual(product_index.lookup("chel"), [{"name": "Leather Chelsea", "slug": "leather-boot"}])
+        self.assertEqual(product_index.lookup("leather"), [{"name": "Leather Chelsea", "slug": "leather-boot"}])
+
+        self.loafer.is_active = False
+        self.loafer.save()
+        self.assertEqual(product_index.lookup("loafer"), [])
+
+        self.boot.delete()
+        self.assertEqual(product_index.lookup("chel"), [])
+
+    def test_changes_during_a_build_are_replayed(self):
+        rows = product_index._rows
+
+        def rows_then_rename():
+            snapshot = list(rows())
+            self.boot.name = "Leather Chelsea"
+            self.boot.save()
+            return snapshot
+
+        with mock.patch.object(product_index, "_rows", rows_then_rename):
+            product_index.build()
+        self.assertEqual(product_index.lookup("chel"), [{"name": "Leather Chelsea", "slug": "leather-boot"}])
+        self.assertEqual(product_index.lookup("leather"), [{"name": "Leather Chelsea", "slug": "leather-boot"}])
+
+    @override_settings(CATALOGUE_AUTOCOMPLETE_SHARED=True, CATALOGUE_AUTOCOMPLETE_SYNC_INTERVAL=0)
+    def test_shared_mode_goes_cold_when_another_process_publishes(self):
+        product_index.build()
+        self.assertIsNotNone(product_index.lookup("boot"))
+        cache.set(VERSION_KEY, "from-another-worker")
+        self.assertIsNone(product_index.lookup("boot"))
+
+    @override_settings(CATALOGUE_AUTOCOMPLETE_SHARED=True, CATALOGUE_AUTOCOMPLETE_SYNC_INTERVAL=0)
+    def test_own_change_does_not_hide_another_workers(self):
+        cache.set(VERSION_KEY, 1, None)
+        product_index.build()
+        self.loafer.save()
+        self.assertIsNotNone(product_index.lookup("boot"))
+
+        cache.incr(VERSION_KEY)  # another worker's change
+        self.loafer.save()
+        self.assertIsNone(product_index.lookup("boot"))
+
+
+_sequence = counter()
+
+
+def make_card_products(category, count, **kwargs):
+    products = []
+    for _ in range(count):
+        i = next(_sequence)
+        product = Product.objects.create(
+            category=category, name=f"{category.name} {i}", base_price=100, **kwargs
+        )
+        ProductImage.objects.create(product=product, image=f"products/{product.slug}.jpg", is_main=True)
+        ProductImage.objects.create(product=product, image=f"products/{product.slug}-back.jpg")
+        ProductVariant.objects.create(product=product, name="S", sku=f"{product.slug}-s", price_adjustment=-10)
+        ProductVariant.objects.create(product=product, name="L", sku=f"{product.slug}-l", price_adjustment=5)
+        products.append(product)
+    return products
+
+
+class ListingQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Shirts", slug="shirts")
+
+    def count_queries(self, url, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_for_listing_prefetches_card_data(self):
+        product = make_card_products(self.category, 1)[0]
+        product = Product.objects.for_listing().get(pk=product.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(product.min_price, 90)
+            self.assertEqual(product.main_image.image.name, f"products/{product.slug}.jpg")
+            self.assertEqual(product.category.name, "Shirts")
+
+    def test_product_list_query_count_does_not_grow_with_page_size(self):
+        make_card_products(self.category, 2)
+        small = self.count_queries(reverse("catalogue:product_list"))
+        make_card_products(Category.objects.create(name="Hats", slug="hats"), 20)
+        self.assertEqual(self.count_queries(reverse("catalogue:product_list")), small)
+
+    def test_search_query_count_does_not_grow_with_page_size(self):
+        make_card_products(self.category, 2)
+        small = self.count_queries(reverse("catalogue:search"), {"q": "shirts"})
+        make_card_products(self.category, 20)
+        self.assertEqual(self.count_queries(reverse("catalogue:search"), {"q": "shirts"}), small)
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Caps", slug="caps")
+        cls.products = [
+            Product.objects.create(category=category, name=f"Cap {i}", base_price=10, rating=rating)
+            for i, rating in enumerate([5, 4, 4, 4, 3, 2, 2])
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_walks_forward_and_back_over_ties(self):
+        queryset = Product.objects.all()
+        expected = sorted(self.products, key=lambda p: (-p.rating, -p.id))
+
+        seen, token, pages = [], "", []
+        while True:
+            page = cursor_page(queryset, 3, TOP_RATED, token)
+            pages.append(page)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            token = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[0].has_previous())
+
+        back = cursor_page(queryset, 3, TOP_RATED, pages[2].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        self.assertTrue(back.has_next())
+
+    def test_deep_pages_skip_count_and_offset(self):
+        queryset = Product.objects.all()
+        first = cursor_page(queryset, 2, TOP_RATED)
+        with CaptureQueriesContext(connection) as queries:
+            cursor_page(queryset, 2, TOP_RATED, first.next_cursor)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("OFFSET", queries[0]["sql"])
+
+    def test_garbage_cursor_falls_back_to_first_page(self):
+        page = cursor_page(Product.objects.all(), 3, TOP_RATED, "not-a-cursor")
+        self.assertEqual(list(page)[0], self.products[0])
+
+    def test_forged_cursor_falls_back_to_first_page(self):
+        for values in (["abc", "x"], [{"a": 1}, 2], [5], "55", [None, 1]):
+            page = cursor_page(Product.objects.all(), 3, TOP_RATED, encode_cursor(values, "n"))
+            self.assertEqual(list(page)[0], self.products[0])
+            self.assertFalse(page.has_previous())
+        token = encode_cursor([{"a": 1}, 2], "n")
+        response = self.client.get(reverse("catalogue:product_list"), {"cursor": token})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("core:home"), {"cursor_rated": token})
+        self.assertEqual(response.status_code, 200)
+
+    def test_numbered_pages_follow_the_keys(self):
+        response = self.client.get(reverse("catalogue:product_list"))
+        self.assertEqual(
+            list(response.context["products"]),
+            sorted(self.products, key=lambda p: (p.created_at, p.id), reverse=True),
+        )
+
+    def test_views_opt_in_with_cursor_parameter(self):
+        response = self.client.get(reverse("catalogue:product_list"), {"cursor": ""})
+        page = response.context["products"]
+        self.assertTrue(page.is_cursor)
+        self.assertEqual(page.paginator.count, len(self.products))
+        self.assertEqual(list(page), sorted(self.products, key=lambda p: (p.created_at, p.id), reverse=True))
+
+
+class ProductSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Coats", slug="coats")
+        cls.coat = Product.objects.create(category=cls.category, name="Coat", base_price=200)
+        cls.long = ProductVariant.objects.create(product=cls.coat, name="Long", sku="coat-long", price_adjustment=50, stock=2)
+        cls.short = ProductVariant.objects.create(product=cls.coat, name="Short", sku="coat-short", price_adjustment=-20)
+        cls.scarf = Product.objects.create(category=cls.category, name="Scarf", base_price=40)
+
+    def summary(self, product):
+        product.refresh_from_db()
+        return product.min_price, product.max_price, product.total_stock, product.in_stock
+
+    def test_follows_variant_and_product_changes(self):
+        self.assertEqual(self.summary(self.coat), (180, 250, 2, True))
+        self.assertEqual(self.summary(self.scarf), (40, 40, 0, False))
+
+        self.long.stock = 0
+        self.long.save()
+        self.assertEqual(self.summary(self.coat), (180, 250, 0, False))
+
+        self.coat.base_price = 100
+        self.coat.save()
+        self.short.delete()
+        self.assertEqual(self.summary(self.coat), (150, 150, 0, False))
+
+    def test_filters_use_summary_columns(self):
+        def filtered(**params):
+            return list(filter_products(Product.objects.order_by("id"), params))
+
+        self.assertEqual(filtered(min_price="100"), [self.coat])
+        self.assertEqual(filtered(max_price="100"), [self.scarf])
+        self.assertEqual(filtered(in_stock="1"), [self.coat])
+
+
+@override_settings(CATALOGUE_THUMBNAILS_ASYNC=False, CATALOGUE_THUMBNAIL_FORMATS=("webp", "jpeg"))
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+        category = Category.objects.create(name="Hoodies", slug="hoodies")
+        self.product = Product.objects.create(category=category, name="Hoodie", base_price=60)
+
+    def upload(self, size=(800, 600)):
+        buffer = BytesIO()
+        PILImage.new("RGB", size, "navy").save(buffer, format="JPEG")
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(
+                product=self.product, image=SimpleUploadedFile("hoodie.jpg", buffer.getvalue()), is_main=True
+            )
+        image.refresh_from_db()
+        return image
+
+    def test_upload_generates_derivatives_and_srcset(self):
+        image = self.upload()
+        self.assertEqual(image.thumbnails, {"source": image.image.name, "webp": [160, 320, 640], "jpeg": [160, 320, 640]})
+        for width in (160, 320, 640):
+            path = default_storage.path(derivative_name(image.image.name, width, "webp"))
+            with PILImage.open(path) as thumb:
+                self.assertEqual(thumb.size, (width, width * 3 // 4))
+
+        self.assertEqual(image.source_sets[0][0], "image/webp")
+        self.assertIn("-320w.webp 320w", image.source_sets[0][1])
+        self.assertIn("-640w.jpg 640w", image.jpeg_srcset)
+
+        response = self.client.get(reverse("catalogue:product_list"))
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_small_images_are_not_upscaled(self):
+        image = self.upload(size=(200, 100))
+        self.assertEqual(image.thumbnails["jpeg"], [160, 200])
+
+    def test_backfill_command(self):
+        image = self.upload()
+        ProductImage.objects.filter(pk=image.pk).update(thumbnails={})
+
+        out = StringIO()
+        call_command("generate_thumbnails", "--workers", "1", stdout=out)
+        self.assertIn("Generated thumbnails for 1 images", out.getvalue())
+        image.refresh_from_db()
+        self.assertEqual(image.thumbnails["webp"], [160, 320, 640])
+
+
+class CatalogueImportExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_csv(self, rows):
+        path = f"{self.directory}/catalogue.csv"
+        with open(path, "w", newline="") as handle:
+            handle.write(",".join(HEADER) + "\n")
+            for row in rows:
+                handle.write(",".join(str(row.get(column, "")) for column in HEADER) + "\n")
+        return path
+
+    def test_import_upserts_in_batches(self):
+        clothing = Category.objects.create(name="Clothing", slug="clothing")
+        existing = Product.objects.create(category=clothing, name="Old name", slug="tee", base_price=5)
+        ProductVariant.objects.create(product=existing, name="S", sku="TEE-S", stock=1)
+
+        rows = [
+            {"category_slug": "tees", "category_name": "Tees", "parent_slug": "clothing", "product_slug": "tee",
+             "product_name": "Plain Tee", "base_price": "20", "sku": "TEE-S", "size": "S", "stock": 3},
+            {"category_slug": "tees", "category_name": "Tees", "parent_slug": "clothing", "product_slug": "tee",
+             "product_name": "Plain Tee", "base_price": "20", "sku": "TEE-L", "size": "L",
+             "price_adjustment": "2.50", "stock": 0},
+            {"category_slug": "hats", "parent_slug": "accessories", "product_name": "Wool Beanie", "base_price": "12"},
+            {"category_slug": "hats", "product_name": "Broken", "base_price": "lots"},
+            {"category_slug": "hats", "product_name": "Pricey", "base_price": "123456789012"},
+            {"category_slug": "hats", "product_name": "Overrated", "base_price": "5", "rating": "7"},
+        ]
+        result = import_catalogue(read_rows(self.write_csv(rows)), batch_size=2)
+
+        self.assertEqual((result.rows, result.error_count), (6, 3))
+        self.assertIn("line 5: base_price 'lots' is not a number", result.errors)
+        self.assertIn(
+            "line 6: base_price '123456789012': Ensure that there are no more than 10 digits in total.", result.errors
+        )
+        self.assertIn("line 7: rating '7' is above 5", result.errors)
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, "Plain Tee")
+        self.assertEqual(existing.category.slug, "tees")
+        self.assertEqual(existing.category.parent, clothing)
+        self.assertEqual(list(existing.variants.order_by("sku").values_list("sku", "stock")), [("TEE-L", 0), ("TEE-S", 3)])
+        self.assertEqual((existing.min_price, existing.max_price, existing.total_stock), (20, Decimal("22.50"), 3))
+
+        beanie = Product.objects.get(slug="wool-beanie")
+        self.assertEqual(beanie.category.parent.slug, "accessories")
+        self.assertEqual(list(search_products(Product.objects.all(), "beanie")), [beanie])
+
+    def test_export_round_trips_through_xlsx(self):
+        category = Category.objects.create(name="Shoes", slug="shoes")
+        boot = Product.objects.create(category=category, name="Boot", base_price="80.00", rating="4.50")
+        ProductVariant.objects.create(product=boot, name="42", sku="BOOT-42", size="42", stock=4)
+        Product.objects.create(category=category, name="Sandal", base_price="30.00")
+
+        path = f"{self.directory}/catalogue.xlsx"
+        out = StringIO()
+        call_command("export_catalogue", path, stdout=out)
+        self.assertIn("Exported 2 rows", out.getvalue())
+
+        rows = list(read_rows(path))
+        self.assertEqual(rows[0]["sku"], "BOOT-42")
+        self.assertEqual(rows[1]["sku"], None)
+
+        Product.objects.all().delete()
+        call_command("import_catalogue", path, stdout=StringIO())
+        boot = Product.objects.get(slug="boot")
+        self.assertEqual((boot.base_price, boot.rating, boot.total_stock), (80, Decimal("4.50"), 4))
+        self.assertTrue(Product.objects.filter(slug="sandal", variants__isnull=True).exists())
+
+    def test_admin_export_action_streams_csv(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", username="admin", password="x")
+        self.client.force_login(admin)
+        category = Category.objects.create(name="Shoes", slug="shoes")
+        boot = Product.objects.create(category=category, name="Boot", base_price=80)
+
+        response = self.client.post(reverse("admin:catalogue_product_changelist"), {
+            "action": "export_csv", "_selected_action": [boot.pk],
+        })
+        content = b"".join(response.streaming_content).decode()
+        self.assertEqual(content.splitlines()[0], ",".join(HEADER))
+        self.assertIn("shoes,Shoes,,boot,Boot", content)
+
+        response = self.client.post(reverse("admin:catalogue_product_import"), {
+            "file": SimpleUploadedFile("catalogue.csv", content.replace(",Boot,", ",Tall Boot,").encode()),
+        })
+        self.assertRedirects(response, reverse("admin:catalogue_product_changelist"))
+        boot.refresh_from_db()
+        self.assertEqual(boot.name, "Tall Boot")
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from orders.models import Order
+
+        cls.order_model = Order
+        shoes = Category.objects.create(name="Shoes", slug="shoes")
+        socks = Category.objects.create(name="Socks", slug="socks")
+        cls.boot, cls.loafer, cls.sandal = make_card_products(shoes, 3)
+        cls.sock = make_card_products(socks, 1)[0]
+        cls.variants = {
+            product.pk: ProductVariant.objects.create(product=product, name="One", sku=f"rec-{product.pk}", stock=100)
+            for product in (cls.boot, cls.loafer, cls.sandal, cls.sock)
+        }
+        # The sandal is priced closer to the boot than the loafer is.
+        Product.objects.filter(pk=cls.loafer.pk).update(base_price=30)
+        Product.objects.filter(pk=cls.sandal.pk).update(base_price=90)
+        Product.objects.all().refresh_summary()
+
+    def pay(self, *products):
+        from orders.models import OrderItem
+
+        order = self.order_model.objects.create()
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, variant=self.variants[product.pk], price=10, quantity=1) for product in products
+        ])
+        order.status = "paid"
+        order.save()
+
+    def recommended(self, product, kind=ProductRecommendation.BOUGHT_TOGETHER):
+        return list(
+            ProductRecommendation.objects.filter(product=product, kind=kind).values_list("recommended__name", flat=True)
+        )
+
+    def test_full_build_ranks_by_co_occurrence_and_price(self):
+        self.pay(self.boot, self.sock)
+        self.pay(self.boot, self.sock, self.loafer)
+        self.pay(self.boot, self.loafer)
+        self.pay(self.boot, self.sock)
+        self.pay(self.sandal)
+        refresh_recommendations()
+
+        self.assertEqual(self.recommended(self.boot), [self.sock.name, self.loafer.name])
+        self.assertEqual(self.recommended(self.sock), [self.boot.name, self.loafer.name])
+        self.assertEqual(self.recommended(self.sandal), [])
+        related = self.recommended(self.boot, ProductRecommendation.RELATED)
+        self.assertEqual(related, [self.sandal.name, self.loafer.name])
+
+    def test_refresh_only_rebuilds_queued_products(self):
+        self.pay(self.boot, self.sock)
+        refresh_recommendations()
+        self.assertFalse(StaleRecommendation.objects.exists())
+
+        self.pay(self.sandal, self.sock)
+        self.pay(self.sandal)
+        self.assertEqual(
+            set(StaleRecommendation.objects.values_list("product_id", flat=True)), {self.sandal.pk, self.sock.pk}
+        )
+        out = StringIO()
+        call_command("build_recommendations", stdout=out)
+        self.assertIn("2 queued products", out.getvalue())
+        self.assertEqual(self.recommended(self.sock), [self.boot.name, self.sandal.name])
+        self.assertEqual(self.recommended(self.sandal), [self.sock.name])
+        self.assertEqual(self.recommended(self.boot), [self.sock.name])
+
+    def test_detail_page_reads_recommendations_in_one_query(self):
+        self.pay(self.boot, self.sock)
+        refresh_recommendations()
+        cache.clear()
+        url = reverse("catalogue:product_detail", args=[self.boot.slug])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, "Frequently bought together")
+        self.assertContains(response, self.sock.name)
+        reads = [query for query in queries if "catalogue_productrecommendation" in query["sql"]]
+        self.assertEqual(len(reads), 1)
+
+
+class CategoryTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clothing = Category.objects.create(name="Clothing", slug="clothing")
+        cls.shoes = Category.objects.create(name="Shoes", slug="shoes", parent=cls.clothing)
+        cls.boots = Category.objects.create(name="Boots", slug="boots", parent=cls.shoes)
+        cls.bags = Category.objects.create(name="Bags", slug="bags")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_paths_follow_moves(self):
+        self.assertEqual(self.boots.path, f"/{self.clothing.pk}/{self.shoes.pk}/{self.boots.pk}/")
+        self.assertEqual(self.boots.depth, 2)
+
+        self.shoes.parent = self.bags
+        self.shoes.save()
+        self.boots.refresh_from_db()
+        self.assertEqual(self.boots.path, f"/{self.bags.pk}/{self.shoes.pk}/{self.boots.pk}/")
+        self.assertEqual(self.boots.depth, 2)
+
+        self.bags.parent = self.boots
+        with self.assertRaises(ValueError):
+            self.bags.save()
+
+    def test_category_filter_includes_subcategories(self):
+        in_boots = make_card_products(self.boots, 1)[0]
+        in_shoes = make_card_products(self.shoes, 1)[0]
+        make_card_products(self.bags, 1)
+
+        products = filter_products(Product.objects.all(), {"category": "clothing"})
+        self.assertEqual(set(products), {in_boots, in_shoes})
+        self.assertEqual(list(filter_products(Product.objects.all(), {"category": "boots"})), [in_boots])
+        self.assertFalse(filter_products(Product.objects.all(), {"category": "missing"}).exists())
+
+    def test_tree_is_cached_until_a_category_changes(self):
+        tree = category_tree()
+        self.assertEqual([category.slug for category in tree.roots], ["bags", "clothing"])
+        self.assertEqual([category.slug for category in tree.ancestors(tree.get("boots"))], ["clothing", "shoes"])
+        with self.assertNumQueries(0):
+            category_tree()
+
+        Category.objects.create(name="Hats", slug="hats", parent=self.clothing)
+        self.assertEqual([child.slug for child in category_tree().get("clothing").subcategories], ["hats", "shoes"])
+
+    def test_categories_from_other_workers_are_found_in_the_database(self):
+        category_tree()
+        version = cache.get(TREE_VERSION_KEY)
+        hats = Category.objects.create(name="Hats", slug="hats", parent=self.clothing)
+        cap = make_card_products(hats, 1)[0]
+        # This worker never saw the bump.
+        cache.set(TREE_VERSION_KEY, version)
+        self.assertIsNone(category_tree().get("hats"))
+
+        self.assertEqual(list(filter_products(Product.objects.all(), {"category": "hats"})), [cap])
+        self.assertEqual(category_tree().get("hats"), hats)
+
+    def test_navbar_lists_categories(self):
+        response = self.client.get(reverse("catalogue:product_list"))
+        self.assertContains(response, "?category=shoes")
+
+    def test_import_rebuilds_paths(self):
+        rows = [{
+            "category_slug": "sandals", "category_name": "Sandals", "parent_slug": "shoes",
+            "product_name": "Flip Flop", "base_price": "9",
+        }]
+        import_catalogue(rows)
+        sandals = Category.objects.get(slug="sandals")
+        self.assertEqual(sandals.path, f"{self.shoes.path}{sandals.pk}/")
+        self.assertIn(sandals, category_tree().get("shoes").subcategories)
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        clothing = Category.objects.create(name="Clothing", slug="clothing")
+        shirts = Category.objects.create(name="Shirts", slug="shirts", parent=clothing)
+        hats = Category.objects.create(name="Hats", slug="hats", parent=clothing)
+        cls.tee = Product.objects.create(category=shirts, name="Tee", base_price=800, rating=4.5)
+        cls.polo = Product.objects.create(category=shirts, name="Polo", base_price=3000, rating=3.2)
+        cls.cap = Product.objects.create(category=hats, name="Cap", base_price=600, rating=2)
+        for product, size, color, stock in (
+            (cls.tee, "M", "Red", 3), (cls.tee, "L", "Red", 0), (cls.polo, "M", "Blue", 0), (cls.cap, "", "Red", 1),
+        ):
+            ProductVariant.objects.create(
+                product=product, name=f"{size} {color}", sku=f"facet-{product.pk}-{size}", size=size, color=color,
+                stock=stock,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_counts_every_facet_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = count_facets(Product.objects.filter(is_active=True))
+        self.assertEqual(counts["price"], {"0": 2, "2": 1})
+        self.assertEqual(counts["rating"], {"4": 1, "3": 1, "2": 1})
+        self.assertEqual(counts["size"], {"M": 2, "L": 1})
+        self.assertEqual(counts["color"], {"Red": 2, "Blue": 1})
+        self.assertEqual(counts["in_stock"], {"1": 2, "0": 1})
+
+    def test_facets_follow_filters_and_are_cached(self):
+        params = QueryDict("category=clothing&color=Red")
+        products = filter_products(Product.objects.filter(is_active=True), params)
+        self.assertEqual(set(products), {self.tee, self.cap})
+
+        facets = {facet["label"]: facet["options"] for facet in build_facets(products, params)}
+        self.assertEqual([(o["label"], o["count"]) for o in facets["Clothing"][1:]], [("Hats", 1), ("Shirts", 1)])
+        self.assertEqual(
+            [(o["label"], o["count"]) for o in facets["Rating"]],
+            [("4★ & up", 1), ("3★ & up", 1), ("2★ & up", 2), ("1★ & up", 2)],
+        )
+        self.assertEqual(facets["Colour"], [{"label": "Red", "count": 2, "selected": True, "url": "?category=clothing"}])
+        self.assertEqual(facets["Price"][0]["url"], "?category=clothing&color=Red&min_price=0&max_price=999.99")
+
+        with self.assertNumQueries(0):
+            build_facets(products, QueryDict("color=Red&category=clothing&page=2"))
+
+    def test_product_list_renders_facets(self):
+        response = self.client.get(reverse("catalogue:product_list"), {"size": "M"})
+        self.assertCountEqual(response.context["products"], [self.polo, self.tee])
+        self.assertContains(response, "Availability")
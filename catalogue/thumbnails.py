@@ -0,0 +1,116 @@
+import io
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (160, 320, 640)
+CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+SAVE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def formats():
+    """Derivative formats to produce, best first, limited to what this Pillow build can encode."""
+    wanted = getattr(settings, "CATALOGUE_THUMBNAIL_FORMATS", ("avif", "webp", "jpeg"))
+    return [fmt for fmt in wanted if fmt == "jpeg" or features.check(fmt)]
+
+
+def derivative_name(name, width, fmt):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, "thumbs", f"{stem}-{width}w.{EXTENSIONS[fmt]}")
+
+
+def generate(name, storage=None):
+    """
+    Write resized copies of the stored image ``name`` next to it (under
+    ``thumbs/``) and return ``{"source": name, format: [widths]}``. Runs
+    without touching the database so it can execute in a worker process.
+    """
+    storage = storage or default_storage
+    with storage.open(name, "rb") as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    # Never upscale; an image narrower than the largest width also gets a re-encoded copy at its own size.
+    widths = [width for width in WIDTHS if width < original.width]
+    if original.width < WIDTHS[-1]:
+        widths.append(original.width)
+
+    generated = {"source": name}
+    for fmt in formats():
+        for width in widths:
+            height = round(original.height * width / original.width)
+            image = original.resize((width, height), Image.Resampling.LANCZOS)
+            if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+
+            target = derivative_name(name, width, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+        generated[fmt] = widths
+    return generated
+
+
+def srcset(name, thumbnails, fmt, storage=None):
+    storage = storage or default_storage
+    return ", ".join(
+        f"{storage.url(derivative_name(name, width, fmt))} {width}w" for width in thumbnails.get(fmt, ())
+    )
+
+
+def _store_result(image_id, name, thumbnails):
+    from core.page_cache import bump_catalogue_version
+    from .models import ProductImage
+
+    # Only record the result if the image still points at the file that was processed.
+    ProductImage.objects.filter(pk=image_id, image=name).update(thumbnails=thumbnails)
+    bump_catalogue_version()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, "CATALOGUE_THUMBNAIL_WORKERS", None) or os.cpu_count()
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def schedule(image_id, name):
+    """Generate derivatives for one upload, in the background pool unless disabled in settings."""
+    if not getattr(settings, "CATALOGUE_THUMBNAILS_ASYNC", True):
+        try:
+            _store_result(image_id, name, generate(name))
+        except Exception:
+            logger.exception("Thumbnail generation failed for %s", name)
+        return
+
+    def done(future):
+        try:
+            _store_result(image_id, name, future.result())
+        except Exception:
+            logger.exception("Thumbnail generation failed for %s", name)
+        finally:
+            close_old_connections()
+
+    _get_pool().submit(generate, name).add_done_callback(done)
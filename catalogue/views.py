@@ -1,68 +1,61 @@
+from django.db.models import Prefetch
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
-from django.db.models import Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Product, Category
+from core.page_cache import cache_anonymous_page
+from .models import Product, ProductImage, ProductRecommendation
+from .facets import build_facets
 from .filters import filter_products
+from .pagination import NEWEST, TOP_RATED, paginate
+from .search import search_products
+from .autocomplete import filter_prefix, product_index
 
+@cache_anonymous_page
 def product_list(request):
-    products = Product.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).for_listing()
     products = filter_products(products, request.GET)
-    categories = Category.objects.filter(parent__isnull=True)
+    facets = build_facets(products, request.GET)
     
-    # Pagination
-    paginator = Paginator(products, 50)
-    page = request.GET.get('page')
-    
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    products = paginate(request, products, 50, NEWEST)
     
     return render(request, "catalogue/product_list.html", {
         "products": products,
-        "categories": categories,
+        "facets": facets,
     })
 
 
+@cache_anonymous_page
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, is_active=True)
     variants = product.variants.all()
+    # One indexed read of the precomputed lists (catalogue.recommendations), plus their card images.
+    recommendations = (
+        ProductRecommendation.objects.filter(product=product, recommended__is_active=True)
+        .select_related("recommended__category")
+        .prefetch_related(Prefetch("recommended__images", queryset=ProductImage.objects.order_by("-is_main", "id")))
+    )
+    grouped = {ProductRecommendation.BOUGHT_TOGETHER: [], ProductRecommendation.RELATED: []}
+    for recommendation in recommendations:
+        grouped[recommendation.kind].append(recommendation.recommended)
     return render(request, "catalogue/product_detail.html", {
         "product": product,
         "variants": variants,
+        "bought_together": grouped[ProductRecommendation.BOUGHT_TOGETHER],
+        "related_products": grouped[ProductRecommendation.RELATED],
     })
 
 
 def search(request):
     query = request.GET.get("q", "").strip()
-    products = Product.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).for_listing()
     
     if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(category__name__icontains=query)
-        )
-    
-    categories = Category.objects.filter(parent__isnull=True)
-    
-    # Pagination
-    paginator = Paginator(products, 50)
-    page = request.GET.get('page')
-    
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+        # Ranked by relevance, so numbered pages rather than a rating keyset.
+        products = paginate(request, search_products(products, query), 50, None)
+    else:
+        products = paginate(request, products, 50, TOP_RATED)
     
     return render(request, "catalogue/search_results.html", {
         "products": products,
-        "categories": categories,
         "query": query,
     })
 
@@ -72,11 +65,14 @@ def search_autocomplete(request):
     
     if len(query) < 2:
         return JsonResponse({"results": []})
-    
-    products = Product.objects.filter(
-        is_active=True,
-        name__icontains=query
-    ).values("name", "slug")[:8]
+
+    results = product_index.lookup(query)
+    if results is not None:
+        return JsonResponse({"results": results})
+
+    # Index still cold: answer from the database while it warms up.
+    product_index.warm_async()
+    products = filter_prefix(Product.objects.filter(is_active=True), query).values("name", "slug")[:8]
     
     results = [
         {
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        import core.signals  # noqa
+        from .metrics import time_templates
+        from .sessions import check_cache
+
+        time_templates()
+        check_cache()
@@ -0,0 +1,315 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+import django
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from cart.cart import CART_COOKIE, COOKIE_SALT
+from cart.models import Cart, CartItem
+from catalogue.models import Category, Product, ProductVariant
+from orders.models import Order, OrderItem
+from payments.inbox import process_batch
+from . import db
+from .synthetic import PREFIX
+
+SCENARIOS = (
+    "home", "product_list", "product_detail", "search", "search_autocomplete",
+    "cart_detail", "add_to_cart", "checkout", "paypal_webhook",
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Fixtures:
+    """Ids and clients the scenarios share, picked once per run."""
+
+    def __init__(self):
+        products = Product.objects.filter(is_active=True).order_by("-rating")
+        self.slugs = list(products.values_list("slug", flat=True)[:50])
+        words = {word for name in products.values_list("name", flat=True)[:50] for word in name.split() if len(word) > 3}
+        self.words = sorted(words)[:20] or ["shirt"]
+        self.categories = list(Category.objects.order_by("depth", "id").values_list("slug", flat=True)[:20])
+        self.variants = list(
+            ProductVariant.objects.filter(product__is_active=True, stock__gt=0).order_by("id").values_list("id", flat=True)[:50]
+        )
+
+        user = get_user_model().objects.filter(username__startswith=f"{PREFIX}-").order_by("id").first()
+        if user is None:
+            user = get_user_model().objects.create_user(
+                email=f"{PREFIX}-runner@example.com", username=f"{PREFIX}-runner", password="x",
+            )
+        self.cart, _ = Cart.objects.get_or_create(user=user)
+        self.anonymous = Client()
+        self.customer = Client()
+        self.customer.force_login(user)
+
+
+def _filters(fixtures):
+    for category in fixtures.categories or [""]:
+        yield {"category": category}
+        yield {"category": category, "min_price": 1000, "max_price": 5000}
+        yield {"in_stock": 1, "min_rating": 3}
+        yield {"size": "M", "color": "Black"}
+
+
+def _fill_cart(fixtures, variants):
+    CartItem.objects.bulk_create(
+        [CartItem(cart=fixtures.cart, variant_id=next(variants), quantity=1) for _ in range(3)],
+        ignore_conflicts=True,
+    )
+
+
+def scenarios(fixtures):
+    """
+    name -> (setup, request) callables. ``setup`` runs untimed before each
+    request; ``request`` returns the response to time.
+    """
+    slugs = cycle(fixtures.slugs or [""])
+    words = cycle(fixtures.words)
+    filters = cycle(list(_filters(fixtures)))
+    variants = cycle(fixtures.variants or [0])
+    pending = []
+
+    def place_order():
+        variant = ProductVariant.objects.select_related("product").get(pk=next(variants))
+        order = Order.objects.create(user_id=fixtures.cart.user_id, total_amount=variant.final_price)
+        OrderItem.objects.create(order=order, variant=variant, price=variant.final_price, quantity=1)
+        pending.append(order)
+
+    def approve_order():
+        # PayPal's approval for the order placed in setup, then the inbox worker applying it.
+        order = pending.pop()
+        response = fixtures.anonymous.post(
+            reverse("payments:paypal_webhook"),
+            data=json.dumps({
+                "id": f"{PREFIX}-{order.transaction_id}",
+                "event_type": "CHECKOUT.ORDER.APPROVED",
+                "resource": {"invoice_id": order.transaction_id},
+            }),
+            content_type="application/json",
+        )
+        process_batch()
+        return response
+
+    return {
+        "home": (None, lambda: fixtures.anonymous.get(reverse("core:home"))),
+        "product_list": (None, lambda: fixtures.anonymous.get(reverse("catalogue:product_list"), next(filters))),
+        "product_detail": (None, lambda: fixtures.anonymous.get(reverse("catalogue:product_detail", args=[next(slugs)]))),
+        "search": (None, lambda: fixtures.anonymous.get(reverse("catalogue:search"), {"q": next(words)})),
+        "search_autocomplete": (
+            None, lambda: fixtures.anonymous.get(reverse("catalogue:search_autocomplete"), {"q": next(words)[:3]}),
+        ),
+        "cart_detail": (lambda: _fill_cart(fixtures, variants), lambda: fixtures.customer.get(reverse("cart:cart_detail"))),
+        "add_to_cart": (
+            None, lambda: fixtures.customer.post(reverse("cart:add_to_cart", args=[next(variants)]), {"quantity": 1}),
+        ),
+        "checkout": (lambda: _fill_cart(fixtures, variants), lambda: fixtures.customer.post(reverse("orders:checkout"))),
+        "paypal_webhook": (place_order, approve_order),
+    }
+
+
+def _percentile(values, q):
+    return round(statistics.quantiles(values, n=100, method="inclusive")[q - 1], 2) if len(values) > 1 else values[0]
+
+
+def summarise(timings, queries, errors):
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "p50_ms": _percentile(timings, 50),
+        "p95_ms": _percentile(timings, 95),
+        "p99_ms": _percentile(timings, 99),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "queries": {"min": min(queries), "max": max(queries), "mean": round(statistics.fmean(queries), 2)},
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, iterations=50, warmup=5, cold=False, progress=None):
+    """
+    Drive each scenario through the test client ``warmup`` times untimed,
+    then ``iterations`` times timed; with ``cold`` every cache is cleared
+    before each request. Everything runs in a transaction that is rolled
+    back at the end, so the writes made by add_to_cart, checkout and the
+    webhook leave the database as it was. Returns a JSON-ready report.
+    """
+    results = {}
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        try:
+            with transaction.atomic():
+                fixtures = Fixtures()
+                available = scenarios(fixtures)
+                for name in names or available:
+                    setup, request = available[name]
+                    timings, queries, errors = [], [], 0
+                    for number in range(warmup + iterations):
+                        if setup:
+                            setup()
+                        if cold:
+                            for cache in caches.all():
+                                cache.clear()
+                        counter = QueryCounter()
+                        started = time.perf_counter()
+                        with connection.execute_wrapper(counter):
+                            response = request()
+                        elapsed = (time.perf_counter() - started) * 1000
+                        if number < warmup:
+                            continue
+                        timings.append(elapsed)
+                        queries.append(counter.count)
+                        errors += response.status_code >= 400
+                    results[name] = summarise(timings, queries, errors)
+                    if progress:
+                        progress(name, results[name])
+                raise Rollback
+        except Rollback:
+            pass
+
+    return {
+        "meta": {
+            "revision": _revision(),
+            "created": timezone.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "products": Product.objects.count(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "cold": cold,
+        },
+        "scenarios": results,
+    }
+
+
+def write(report, path):
+    with open(path, "w") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+
+
+def throughput(workers=4, requests=50):
+    """
+    add_to_cart requests per second with ``workers`` threads posting at
+    once, first as guests and then as logged-in customers (whose requests
+    also read the session). Each thread has its own client and database
+    connection; an in-memory SQLite database cannot be shared between them,
+    so this needs a file-backed or server database. The carts, users and
+    sessions created here are deleted afterwards.
+    """
+    variants = list(
+        ProductVariant.objects.filter(product__is_active=True).order_by("id").values_list("id", flat=True)[:50]
+    )
+    User = get_user_model()
+    users = [
+        User.objects.create_user(email=f"{PREFIX}-load-{number}@example.com", username=f"{PREFIX}-load-{number}")
+        for number in range(workers)
+    ]
+    results = {"session_engine": settings.SESSION_ENGINE}
+    guests, customers = [], []
+    try:
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for kind in ("guest", "customer"):
+                clients = [Client(raise_request_exception=False) for _ in range(workers)]
+                if kind == "customer":
+                    for client, user in zip(clients, users):
+                        customers.append(client)
+                        client.force_login(user)
+
+                def work(client):
+                    errors = 0
+                    try:
+                        for number in range(requests):
+                            url = reverse("cart:add_to_cart", args=[variants[number % len(variants)]])
+                            errors += client.post(url, {"quantity": 1}).status_code >= 400
+                    finally:
+                        connections.close_all()
+                    return errors
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    errors = sum(pool.map(work, clients))
+                elapsed = time.perf_counter() - started
+                results[kind] = {
+                    "workers": workers,
+                    "requests": workers * requests,
+                    "errors": errors,
+                    "seconds": round(elapsed, 3),
+                    "requests_per_second": round(workers * requests / elapsed, 1),
+                }
+                if kind == "guest":
+                    guests = clients
+    finally:
+        # logout() deletes the session from whichever engine stored it.
+        for client in customers:
+            client.logout()
+        tokens = [client.cookies[CART_COOKIE].value for client in guests if CART_COOKIE in client.cookies]
+        signer = signing.get_cookie_signer(salt=CART_COOKIE + COOKIE_SALT)
+        Cart.objects.filter(token__in=[signer.unsign(token) for token in tokens]).delete()
+        User.objects.filter(pk__in=[user.pk for user in users]).delete()
+    return results
+
+
+def sqlite_comparison(workers=4, requests=50):
+    """
+    throughput() twice on SQLite: first with the driver defaults (rollback
+    journal, synchronous=FULL, deferred transactions), then tuned (core.db's
+    pragmas with WAL, and IMMEDIATE transactions). The database file is put
+    back in the journal mode it started in afterwards.
+    """
+    options = connections["default"].settings_dict.setdefault("OPTIONS", {})
+    tuned_mode = options.get("transaction_mode")
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        journal_mode = cursor.fetchone()[0]
+    results = {}
+    try:
+        for label, pragmas, mode in (
+            ("default", {"journal_mode": "delete", "synchronous": "full"}, None),
+            ("tuned", {**db.PRAGMAS, **db.WAL_PRAGMAS}, tuned_mode),
+        ):
+            if mode:
+                options["transaction_mode"] = mode
+            else:
+                options.pop("transaction_mode", None)
+            connections.close_all()
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                results[label] = throughput(workers, requests)
+                connections.close_all()
+    finally:
+        if tuned_mode:
+            options["transaction_mode"] = tuned_mode
+        connections.close_all()
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+    return results
@@ -1,10 +1,21 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from .models import SiteSettings
+from .page_cache import catalogue_version as current_catalogue_version
 
 def site_settings(request):
     try:
-        settings_obj = SiteSettings.objects.first()
+        settings_obj = SiteSettings.load()
     except Exception:
         settings_obj = None
     return {
         "site_settings": settings_obj,
     }
+
+
+def catalogue_version(request):
+    # Part of the product_card.html fragment cache key; cards expire with the pages.
+    return {
+        "catalogue_version": SimpleLazyObject(current_catalogue_version),
+        "page_cache_timeout": getattr(settings, "PAGE_CACHE_TIMEOUT", 600),
+    }
@@ -0,0 +1,32 @@
+from django.conf import settings
+
+# Applied to every new SQLite connection.
+PRAGMAS = {
+    # Wait up to 5s for the write lock instead of failing with "database is locked".
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+# Added when SQLITE_WAL is on. Readers no longer block the writer (and vice
+# versa), and in WAL mode only a power loss, not a crash, can lose the last
+# commits. The journal mode is stored in the database file itself, so it is
+# opt-in rather than rewriting whichever file a connection happens to open.
+WAL_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+}
+
+
+def pragmas():
+    """The pragmas for new connections; SQLITE_PRAGMAS, if set, replaces them outright."""
+    configured = getattr(settings, "SQLITE_PRAGMAS", None)
+    if configured is not None:
+        return configured
+    return {**PRAGMAS, **WAL_PRAGMAS} if getattr(settings, "SQLITE_WAL", False) else PRAGMAS
+
+
+def configure_sqlite(connection):
+    """Set the pragmas on a fresh connection, through the raw driver so they stay out of query logs."""
+    for name, value in pragmas().items():
+        if name == "journal_mode" and connection.is_in_memory_db():
+            continue
+        connection.connection.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import autodiscover_modules
+from core.query_plans import full_scans, registry
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every registered hot query and fail if any of them scans a whole table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan, not just failures.")
+
+    def handle(self, *args, **options):
+        autodiscover_modules("hot_queries")
+
+        failures = []
+        for name, (factory, allow_scan) in sorted(registry.items()):
+            plan = factory().explain()
+            scans = full_scans(plan, allow_scan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if scans or options["verbose_plans"]:
+                self.stdout.write(f"    {plan}".replace("\n", "\n    "))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries do full scans: {', '.join(failures)}")
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from core import synthetic
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible synthetic catalogue, users, carts and orders for benchmarking."
+
+    def add_arguments(self, parser):
+        defaults = synthetic.Scale()
+        parser.add_argument("--products", type=int, default=defaults.products)
+        parser.add_argument("--variants", type=int, default=defaults.variants, help="Variants per product.")
+        parser.add_argument("--images", type=int, default=defaults.images, help="Images per product.")
+        parser.add_argument("--category-fanout", type=int, default=defaults.category_fanout)
+        parser.add_argument("--category-depth", type=int, default=defaults.category_depth)
+        parser.add_argument("--users", type=int, default=defaults.users)
+        parser.add_argument("--carts", type=int, default=defaults.carts, help="Users whose carts get items.")
+        parser.add_argument("--orders", type=int, default=defaults.orders)
+        parser.add_argument("--days", type=int, default=defaults.days, help="Spread orders over this many past days.")
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--replace", action="store_true", help="Delete a previously generated dataset first.")
+
+    def handle(self, *args, **options):
+        if synthetic.exists():
+            if not options["replace"]:
+                raise CommandError("A generated dataset already exists; pass --replace to rebuild it.")
+            synthetic.delete()
+
+        scale = synthetic.Scale(**{
+            key: options[key] for key in (
+                "products", "variants", "images", "category_fanout", "category_depth",
+                "users", "carts", "orders", "days", "seed",
+            )
+        })
+
+        def progress(step, done):
+            self.stdout.write(f"{step}: {done}")
+
+        timings = synthetic.generate(scale, options["batch_size"], progress if options["verbosity"] > 1 else None)
+        for step, seconds in timings.items():
+            self.stdout.write(f"{step}: {seconds:.1f}s")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {scale.products} products, {scale.users} users and {scale.orders} orders "
+            f"in {sum(timings.values()):.1f}s."
+        ))
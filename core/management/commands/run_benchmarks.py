@@ -0,0 +1,68 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = "Time the main views through the test client and write latency percentiles and query counts as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenario", action="append", choices=benchmark.SCENARIOS, help="Repeat to run several; default all.")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--cold", action="store_true", help="Clear the caches before every request.")
+        parser.add_argument(
+            "--concurrency", type=int, default=0,
+            help="Also measure add_to_cart throughput with this many concurrent workers (needs a file or server database).",
+        )
+        parser.add_argument(
+            "--compare-sqlite", action="store_true",
+            help="With --concurrency on SQLite, measure the driver defaults against the tuned pragmas.",
+        )
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--baseline", help="A previous report to print the differences against.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        baseline = {}
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as handle:
+                    baseline = json.load(handle)["scenarios"]
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f"Cannot read baseline: {exc}")
+
+        def progress(name, result):
+            line = f"{name:<20} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  " \
+                   f"p99 {result['p99_ms']:>8.2f}ms  queries {result['queries']['max']:>3}"
+            if name in baseline:
+                before = baseline[name]
+                line += f"  (p95 {result['p95_ms'] - before['p95_ms']:+.2f}ms, " \
+                        f"queries {result['queries']['max'] - before['queries']['max']:+d})"
+            if result["errors"]:
+                line += f"  {result['errors']} errors"
+            self.stdout.write(line)
+
+        report = benchmark.run(
+            options["scenario"], options["iterations"], options["warmup"], options["cold"], progress,
+        )
+        if options["concurrency"]:
+            if options["compare_sqlite"]:
+                if connection.vendor != "sqlite":
+                    raise CommandError("--compare-sqlite needs a SQLite database.")
+                runs = benchmark.sqlite_comparison(options["concurrency"], options["iterations"])
+                report["sqlite"] = runs
+            else:
+                report["throughput"] = benchmark.throughput(options["concurrency"], options["iterations"])
+                runs = {"": report["throughput"]}
+            for label, run in runs.items():
+                for kind in ("guest", "customer"):
+                    result = run[kind]
+                    self.stdout.write(
+                        f"{label + ' ' if label else ''}{kind} add_to_cart x{result['workers']}: "
+                        f"{result['requests_per_second']:.1f} req/s, {result['errors']} errors ({run['session_engine']})"
+                    )
+        benchmark.write(report, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
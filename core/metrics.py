@@ -0,0 +1,219 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from django.template import base as template_base
+from . import page_cache
+
+logger = logging.getLogger(__name__)
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100, 200)
+# metric -> (histogram buckets, Prometheus name, help text)
+METRICS = {
+    "total": (SECONDS, "view_duration_seconds", "Time spent handling the request."),
+    "db": (SECONDS, "view_db_seconds", "Time spent executing SQL."),
+    "template": (SECONDS, "view_template_seconds", "Time spent rendering templates, context processors included."),
+    "queries": (QUERIES, "view_queries", "SQL queries executed."),
+}
+# Budget keys and the metric each one caps; times are budgeted in milliseconds.
+BUDGETS = {"queries": "queries", "db_ms": "db", "template_ms": "template", "total_ms": "total"}
+
+_active = contextvars.ContextVar("request_metrics", default=None)
+_histograms = {}
+_exceeded = {}
+_lock = threading.Lock()
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile; the observed max past the last bucket."""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return min(bound, self.max)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0
+        self.template = 0
+        self.total = 0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - start
+
+
+_render = template_base.Template.render
+
+
+def _timed_render(self, context):
+    metrics = _active.get()
+    # Included templates render inside their parent; only the outermost render is timed.
+    if metrics is None or metrics.rendering:
+        return _render(self, context)
+    metrics.rendering = True
+    start = time.perf_counter()
+    try:
+        return _render(self, context)
+    finally:
+        metrics.rendering = False
+        metrics.template += time.perf_counter() - start
+
+
+def time_templates():
+    """Route Template.render through _timed_render; called once from CoreConfig.ready()."""
+    template_base.Template.render = _timed_render
+
+
+def record(name, metrics):
+    with _lock:
+        for metric, (buckets, _, _) in METRICS.items():
+            histogram = _histograms.get((name, metric))
+            if histogram is None:
+                histogram = _histograms[(name, metric)] = Histogram(buckets)
+            histogram.observe(getattr(metrics, metric))
+
+
+def check_budget(name, metrics):
+    budget = getattr(settings, "VIEW_BUDGETS", {}).get(name, {})
+    over = []
+    for key, metric in BUDGETS.items():
+        if key not in budget:
+            continue
+        value = getattr(metrics, metric)
+        if key.endswith("_ms"):
+            value = round(value * 1000, 1)
+        if value > budget[key]:
+            over.append(f"{key}={value} (budget {budget[key]})")
+            with _lock:
+                _exceeded[(name, key)] = _exceeded.get((name, key), 0) + 1
+    if over:
+        message = f"{name} over budget: {', '.join(over)}"
+        if getattr(settings, "VIEW_BUDGET_RAISE", False):
+            raise BudgetExceeded(message)
+        logger.warning(message)
+
+
+def snapshot():
+    """Per-view summaries for this process, e.g. {"core:home": {"queries": {"count": 3, "p95": 5, ...}}}."""
+    with _lock:
+        views = {}
+        for (name, metric), histogram in sorted(_histograms.items()):
+            views.setdefault(name, {})[metric] = histogram.summary()
+        for (name, key), count in _exceeded.items():
+            views.setdefault(name, {}).setdefault("budget_exceeded", {})[key] = count
+        return views
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def prometheus():
+    """The histograms, budget overruns and page cache counters in Prometheus text format."""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        exceeded = sorted(_exceeded.items())
+    for metric, (_, name, help_text) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (view, observed), histogram in histograms:
+            if observed != metric:
+                continue
+            for bound, total in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f"{name}_bucket{{{_labels(view=view, le=le)}}} {total}")
+            lines.append(f"{name}_sum{{{_labels(view=view)}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{_labels(view=view)}}} {histogram.count}")
+    lines += ["# HELP view_budget_exceeded_total Requests over a VIEW_BUDGETS limit.",
+              "# TYPE view_budget_exceeded_total counter"]
+    lines += [f"view_budget_exceeded_total{{{_labels(view=view, budget=key)}}} {count}"
+              for (view, key), count in exceeded]
+    lines += ["# HELP page_cache_requests_total Anonymous page cache lookups.",
+              "# TYPE page_cache_requests_total counter"]
+    for view, outcomes in sorted(page_cache.stats().items()):
+        lines += [f"page_cache_requests_total{{{_labels(view=view, outcome=outcome)}}} {count}"
+                  for outcome, count in sorted(outcomes.items())]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _exceeded.clear()
+
+
+class MetricsMiddleware:
+    """
+    Record query count, SQL time, template time and total time for every
+    request, per resolved URL name, and hold them against VIEW_BUDGETS.
+    Belongs at the top of MIDDLEWARE so the total covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _active.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _active.reset(token)
+        metrics.total = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        name = match.view_name if match else "<unresolved>"
+        record(name, metrics)
+        check_budget(name, metrics)
+        return response
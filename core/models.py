@@ -1,6 +1,14 @@
+import uuid
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from ckeditor.fields import RichTextField
 
+SITE_SETTINGS_VERSION_KEY = "core:site_settings:version"
+
+# Process-wide copy of the settings row, tagged with the version it was loaded at.
+_loaded = {"version": None, "object": None}
+
 class SiteSettings(models.Model):
     primary_color = models.CharField(max_length=7, default="#0d6efd")
     secondary_color = models.CharField(max_length=7, default="#6c757d")
@@ -15,6 +23,29 @@ class SiteSettings(models.Model):
     def __str__(self):
         return "Theme Settings"
 
+    @classmethod
+    def load(cls):
+        """
+        The site settings row, reloaded only when the version stamp in the
+        cache moves (see ``bump_version``), so most renders skip the query.
+        With a process-local cache the stamp expires after
+        VERSION_STAMP_TIMEOUT seconds, which bounds how long a save made in
+        another worker goes unnoticed.
+        """
+        version = cache.get(SITE_SETTINGS_VERSION_KEY)
+        if version is None:
+            version = cls.bump_version()
+        if _loaded["version"] != version:
+            _loaded["object"] = cls.objects.first()
+            _loaded["version"] = version
+        return _loaded["object"]
+
+    @staticmethod
+    def bump_version():
+        version = uuid.uuid4().hex
+        cache.set(SITE_SETTINGS_VERSION_KEY, version, getattr(settings, "VERSION_STAMP_TIMEOUT", 30))
+        return version
+
 
 
 class StaticPage(models.Model):
@@ -0,0 +1,97 @@
+import functools
+import hashlib
+import re
+import threading
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+VERSION_KEY = "catalogue:version"
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, "PAGE_CACHE_ALIAS", "default")]
+
+
+def catalogue_version():
+    """Counter bumped whenever anything shown on a catalogue page changes."""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_catalogue_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        _stats[(name, outcome)] += 1
+
+
+def stats():
+    """Hit/miss/skip counts per view for this process, e.g. {"core:home": {"hit": 3, "miss": 1}}."""
+    with _stats_lock:
+        result = {}
+        for (name, outcome), count in _stats.items():
+            result.setdefault(name, {})[outcome] = count
+        return result
+
+
+def _page_key(request, name, version):
+    params = sorted(request.GET.lists())
+    digest = hashlib.md5(repr(params).encode("utf-8")).hexdigest()
+    return f"page:{version}:{name}:{request.path}:{digest}"
+
+
+def cache_anonymous_page(view):
+    """
+    Serve a view's HTML from the cache for anonymous GET requests.
+
+    Entries are keyed by view name, path, query string and the catalogue
+    version, so a save to any catalogue model retires them immediately rather
+    than waiting for a TTL. CSRF tokens are swapped out for the visitor's own
+    on the way out, and responses that set other cookies are never stored.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        name = request.resolver_match.view_name if request.resolver_match else view.__name__
+        if request.method not in ("GET", "HEAD") or request.user.is_authenticated:
+            _record(name, "skip")
+            return view(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = _page_key(request, name, catalogue_version())
+        cached = cache.get(key)
+        if cached is not None:
+            _record(name, "hit")
+            content, content_type = cached
+            if CSRF_PLACEHOLDER in content:
+                content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Page-Cache"] = "hit"
+            return response
+
+        _record(name, "miss")
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            content = CSRF_INPUT.sub(rf"\g<1>{CSRF_PLACEHOLDER}\g<2>", response.content.decode(response.charset))
+            cache.set(key, (content, response["Content-Type"]), getattr(settings, "PAGE_CACHE_TIMEOUT", 600))
+        response["X-Page-Cache"] = "miss"
+        return response
+
+    return wrapper
@@ -0,0 +1,34 @@
+import re
+from django.db import connection
+
+# name -> (factory returning a queryset, tables allowed to be scanned)
+registry = {}
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?!CONSTANT ROW)(?P<table>\w+)(?P<rest>.*)")
+POSTGRES_SCAN = re.compile(r"Seq Scan on (?P<table>\w+)")
+
+
+def hot_query(name, allow_scan=()):
+    """
+    Register a queryset factory whose plan ``manage.py check_query_plans``
+    should verify. Apps declare theirs in a ``hot_queries`` module.
+    """
+    def decorator(factory):
+        registry[name] = (factory, tuple(allow_scan))
+        return factory
+    return decorator
+
+
+def full_scans(plan, allow_scan=()):
+    """Tables ``plan`` reads end to end without an index."""
+    tables = []
+    for line in plan.splitlines():
+        if connection.vendor == "postgresql":
+            match = POSTGRES_SCAN.search(line)
+        else:
+            match = SQLITE_SCAN.search(line)
+            if match and ("USING" in match.group("rest") or "VIRTUAL TABLE" in match.group("rest")):
+                match = None
+        if match and match.group("table") not in allow_scan:
+            tables.append(match.group("table"))
+    return tables
@@ -0,0 +1,87 @@
+"""
+Cache-first sessions with a write-behind database copy.
+
+Reads come from the cache and only fall back to the database on a miss.
+Saves always refresh the cache, but the database row is only rewritten when
+the session is new or its last database write is older than
+SESSION_DB_WRITE_INTERVAL seconds, so a burst of requests costs one row
+write instead of one per request. A save whose data is unchanged since it
+was loaded is skipped entirely. The cache has to be shared between worker
+processes (Redis, Memcached); check_cache() refuses to start with a
+per-process one, use the "db" strategy there instead.
+"""
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger("django.contrib.sessions")
+
+
+def write_interval():
+    return getattr(settings, "SESSION_DB_WRITE_INTERVAL", 60)
+
+
+def check_cache():
+    """
+    Raise ImproperlyConfigured when this engine is selected over a LocMemCache:
+    each worker would keep its own sessions, and saves not yet written to the
+    database would be lost when the entry is evicted.
+    """
+    if settings.SESSION_ENGINE != __name__:
+        return
+    if isinstance(caches[settings.SESSION_CACHE_ALIAS], LocMemCache):
+        raise ImproperlyConfigured(
+            f"SESSION_ENGINE {__name__!r} needs a cache shared by all workers, but "
+            f"CACHES[{settings.SESSION_CACHE_ALIAS!r}] is a LocMemCache. Configure Redis or Memcached "
+            "(CACHE_BACKEND) or use SESSION_STRATEGY=db."
+        )
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = "core.sessions"
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._digest = None
+        self._synced = None
+
+    def _fingerprint(self, data):
+        return hashlib.md5(self.encode(data).encode("ascii")).hexdigest() if data else None
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            entry = None
+
+        if entry is not None:
+            data, self._synced = entry
+        else:
+            row = self._get_session_from_db()
+            data = self.decode(row.session_data) if row else {}
+            self._synced = time.time() if row else None
+            if row:
+                self._cache.set(self.cache_key, (data, self._synced), self.get_expiry_age(expiry=row.expire_date))
+        self._digest = self._fingerprint(data)
+        return data
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if not must_create and self.session_key and self._fingerprint(data) == self._digest:
+            return
+
+        now = time.time()
+        if must_create or self.session_key is None or self._synced is None or now - self._synced >= write_interval():
+            # Also creates the key and row for a new session (db.SessionStore.save -> create).
+            super(CachedDBStore, self).save(must_create)
+            self._synced = now
+        try:
+            self._cache.set(self.cache_key, (self._session, self._synced), self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+        self._digest = self._fingerprint(self._session)
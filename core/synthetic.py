@@ -0,0 +1,213 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from cart.models import Cart, CartItem
+from catalogue import category_tree, recommendations, search
+from catalogue.autocomplete import product_index
+from catalogue.models import Category, Product, ProductImage, ProductVariant
+from orders import rollups
+from orders.models import Order, OrderItem
+from .page_cache import bump_catalogue_version
+
+# Every generated slug, SKU and username starts with this, so a dataset can be
+# told apart from real data and replaced.
+PREFIX = "bench"
+PASSWORD = "bench-password"
+ADJECTIVES = ("Classic", "Vintage", "Slim", "Relaxed", "Heritage", "Urban", "Tailored", "Soft", "Rugged", "Linen")
+NOUNS = ("Shirt", "Jacket", "Trousers", "Boots", "Scarf", "Cap", "Blazer", "Sweater", "Dress", "Sneakers")
+COLOURS = ("Black", "White", "Navy", "Olive", "Red", "Grey", "Tan")
+SIZES = ("XS", "S", "M", "L", "XL")
+
+
+class Scale:
+    def __init__(self, products=100000, variants=3, images=1, category_fanout=8, category_depth=3,
+                 users=2000, carts=500, orders=20000, days=365, seed=42):
+        self.products = products
+        self.variants = variants
+        self.images = images
+        self.category_fanout = category_fanout
+        self.category_depth = category_depth
+        self.users = users
+        self.carts = min(carts, users)
+        self.orders = orders
+        self.days = days
+        self.seed = seed
+
+
+def exists():
+    return Product.objects.filter(slug__startswith=f"{PREFIX}-").exists()
+
+
+def delete():
+    """Remove a previously generated dataset, orders first so variants are no longer protected."""
+    Order.objects.filter(user__username__startswith=f"{PREFIX}-").delete()
+    get_user_model().objects.filter(username__startswith=f"{PREFIX}-").delete()
+    Product.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+    Category.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _categories(rng, scale):
+    leaves, parents = [], [None]
+    for depth in range(scale.category_depth):
+        level = Category.objects.bulk_create([
+            Category(
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {depth}.{position}",
+                slug=f"{PREFIX}-{depth}-{position}",
+                parent=parent,
+                is_featured=depth == 0 and position < 6,
+            )
+            for position, parent in enumerate(p for p in parents for _ in range(scale.category_fanout))
+        ])
+        parents = leaves = level
+    Category.rebuild_paths()
+    return [category.pk for category in leaves]
+
+
+def _products(rng, scale, leaves, batch_size, progress):
+    variant_ids = []
+    for batch in _batches(range(scale.products), batch_size):
+        products = Product.objects.bulk_create([
+            Product(
+                category_id=rng.choice(leaves),
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(COLOURS)} {rng.choice(NOUNS)} {number}",
+                slug=f"{PREFIX}-{number}",
+                description="Synthetic benchmark product.",
+                base_price=Decimal(rng.randrange(300, 20000)),
+                rating=Decimal(rng.randrange(0, 501)) / 100,
+                is_featured=rng.random() < 0.01,
+            )
+            for number in batch
+        ])
+        variants = ProductVariant.objects.bulk_create([
+            ProductVariant(
+                product=product,
+                name=f"{size} / {colour}",
+                size=size,
+                color=colour,
+                sku=f"{PREFIX}-{product.slug[len(PREFIX) + 1:]}-{position}",
+                price_adjustment=Decimal(rng.choice((0, 0, 250, 500))),
+                stock=rng.choice((0, 5, 20, 100)),
+            )
+            for product in products
+            for position, (size, colour) in enumerate(
+                rng.sample([(size, colour) for size in SIZES for colour in COLOURS], scale.variants)
+            )
+        ])
+        variant_ids += [variant.pk for variant in variants]
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f"products/{PREFIX}/{product.slug}-{position}.jpg",
+                         alt_text=product.name, is_main=position == 0)
+            for product in products for position in range(scale.images)
+        ])
+        Product.objects.filter(pk__in=[product.pk for product in products]).refresh_summary()
+        if progress:
+            progress("products", batch[-1] + 1)
+    return variant_ids
+
+
+def _users(scale, batch_size):
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    user_ids = []
+    for batch in _batches(range(scale.users), batch_size):
+        users = User.objects.bulk_create([
+            User(username=f"{PREFIX}-{number}", email=f"{PREFIX}-{number}@example.com", password=password)
+            for number in batch
+        ])
+        # bulk_create skips the post_save signal that gives every user a cart.
+        Cart.objects.bulk_create([Cart(user=user) for user in users])
+        user_ids += [user.pk for user in users]
+    return user_ids
+
+
+def _carts(rng, scale, user_ids, variant_ids):
+    carts = Cart.objects.filter(user_id__in=user_ids[:scale.carts]).values_list("pk", flat=True)
+    CartItem.objects.bulk_create([
+        CartItem(cart_id=cart_id, variant_id=variant_id, quantity=rng.randint(1, 3))
+        for cart_id in carts for variant_id in rng.sample(variant_ids, rng.randint(1, 5))
+    ])
+
+
+def _orders(rng, scale, user_ids, variant_ids, batch_size, progress):
+    prices = dict(
+        ProductVariant.objects.filter(product__slug__startswith=f"{PREFIX}-")
+        .values_list("pk", F("product__base_price") + F("price_adjustment"))
+    )
+    now = timezone.now()
+    for batch in _batches(range(scale.orders), batch_size):
+        orders, lines = [], []
+        for number in batch:
+            items = [(variant_id, rng.randint(1, 3)) for variant_id in rng.sample(variant_ids, rng.randint(1, 4))]
+            priced = [(variant_id, quantity, prices[variant_id]) for variant_id, quantity in items]
+            paid = rng.random() < 0.8
+            orders.append(Order(
+                user_id=rng.choice(user_ids),
+                transaction_id=f"BENCH{number:07d}",
+                status="paid" if paid else rng.choice(("pending", "cancelled")),
+                total_amount=sum(price * quantity for _, quantity, price in priced),
+                stock_committed=paid,
+            ))
+            lines.append(priced)
+        orders = Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, variant_id=variant_id, quantity=quantity, price=price)
+            for order, priced in zip(orders, lines) for variant_id, quantity, price in priced
+        ])
+        # created_at is auto_now_add, so the spread over past days is applied afterwards.
+        for order in orders:
+            order.created_at = now - datetime.timedelta(seconds=rng.randrange(scale.days * 86400))
+        Order.objects.bulk_update(orders, ["created_at"], batch_size=500)
+        if progress:
+            progress("orders", batch[-1] + 1)
+
+
+def generate(scale, batch_size=5000, progress=None):
+    """
+    Build a reproducible dataset at ``scale`` with bulk_create: a category
+    tree, products with variants and images, users with carts, and orders
+    spread over the last ``scale.days`` days. The same seed always yields the
+    same rows. Denormalised data (search index, category paths, price
+    summaries, sales rollups and recommendations) is rebuilt at the end, since
+    bulk writes bypass the signals that maintain it. Returns per-step timings.
+    """
+    rng = random.Random(scale.seed)
+    timings = {}
+
+    def step(name, function, *args):
+        started = time.monotonic()
+        with transaction.atomic():
+            value = function(*args)
+        timings[name] = round(time.monotonic() - started, 2)
+        return value
+
+    leaves = step("categories", _categories, rng, scale)
+    variant_ids = step("products", _products, rng, scale, leaves, batch_size, progress)
+    user_ids = step("users", _users, scale, batch_size)
+    step("carts", _carts, rng, scale, user_ids, variant_ids)
+    if scale.orders and user_ids:
+        step("orders", _orders, rng, scale, user_ids, variant_ids, batch_size, progress)
+
+    step("search index", search.rebuild_index)
+    step("sales rollups", rollups.rebuild)
+    step("recommendations", recommendations.refresh, True)
+    category_tree.bump_version()
+    product_index.invalidate()
+    bump_catalogue_version()
+    return timings
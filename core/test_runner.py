@@ -0,0 +1,15 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class BudgetTestRunner(DiscoverRunner):
+    """The default runner, with VIEW_BUDGETS overruns failing the request instead of logging."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.budgets = override_settings(VIEW_BUDGET_RAISE=True)
+        self.budgets.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.budgets.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,353 @@
-from django.test import TestCase
+import re
+import tempfile
+import time
+from decimal import Decimal
+from io import BytesIO, StringIO
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from cart.models import Cart, CartItem
+from catalogue.models import Category, Product
+from catalogue.tests import make_card_products
+from orders.models import DailySales, Order
+from payments.models import WebhookEvent
+from . import benchmark, db, metrics, page_cache, sessions, synthetic
+from .exports import write_xlsx, xlsx_chunks
+from .models import SiteSettings
+from .query_plans import full_scans
+from .sessions import SessionStore
 
-# Create your tests here.
+
+class HomeQueryCountTests(TestCase):
+    def count_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("core:home"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_cards(self):
+        category = Category.objects.create(name="Shoes", slug="shoes", is_featured=True)
+        make_card_products(category, 1, is_featured=True)
+        small = self.count_queries()
+        make_card_products(Category.objects.create(name="Hats", slug="hats"), 16, is_featured=True)
+        self.assertEqual(self.count_queries(), small)
+
+
+class SiteSettingsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_load_hits_database_once_until_saved(self):
+        SiteSettings.objects.create(featured_title="Old")
+        self.assertEqual(SiteSettings.load().featured_title, "Old")
+        with self.assertNumQueries(0):
+            self.assertEqual(SiteSettings.load().featured_title, "Old")
+
+        settings_obj = SiteSettings.objects.get()
+        settings_obj.featured_title = "New"
+        settings_obj.save()
+        self.assertEqual(SiteSettings.load().featured_title, "New")
+
+    @override_settings(VERSION_STAMP_TIMEOUT=0.05)
+    def test_local_stamp_expires_so_other_workers_catch_up(self):
+        SiteSettings.objects.create(featured_title="Old")
+        self.assertEqual(SiteSettings.load().featured_title, "Old")
+        # Saved by another process: no bump reaches this one.
+        SiteSettings.objects.update(featured_title="New")
+        self.assertEqual(SiteSettings.load().featured_title, "Old")
+        time.sleep(0.1)
+        self.assertEqual(SiteSettings.load().featured_title, "New")
+
+    def test_pages_render_without_settings_query_or_session(self):
+        SiteSettings.objects.create(featured_title="Cached")
+        self.client.get(reverse("core:home"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("core:home"))
+        self.assertContains(response, "Cached")
+        self.assertFalse(any("core_sitesettings" in q["sql"] for q in queries))
+        self.assertFalse(any("django_session" in q["sql"] for q in queries))
+        self.assertNotIn("sessionid", response.cookies)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command("check_query_plans", stdout=out)
+        self.assertNotIn("full scan", out.getvalue())
+
+    def test_full_scans_are_reported(self):
+        plan = "3 0 0 SCAN catalogue_product\n9 0 0 SCAN catalogue_product_fts VIRTUAL TABLE INDEX 0:M3"
+        self.assertEqual(full_scans(plan), ["catalogue_product"])
+        self.assertEqual(full_scans("4 0 0 SCAN catalogue_product USING INDEX idx"), [])
+        self.assertEqual(full_scans(plan, allow_scan=("catalogue_product",)), [])
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Shoes", slug="shoes")
+        cls.product = make_card_products(cls.category, 1, is_featured=True)[0]
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        url = reverse("catalogue:product_list")
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "miss")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertContains(response, self.product.name)
+        self.assertEqual(self.client.get(url, {"page": "2"})["X-Page-Cache"], "miss")
+        self.assertGreaterEqual(page_cache.stats()["catalogue:product_list"]["hit"], 1)
+
+    def test_catalogue_saves_invalidate_pages(self):
+        url = reverse("core:home")
+        self.client.get(url)
+        self.product.name = "Renamed Shoe"
+        self.product.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertContains(response, "Renamed Shoe")
+
+        image = self.product.images.first()
+        image.alt_text = "new alt"
+        image.save()
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "miss")
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0.05)
+    def test_pages_expire_when_another_worker_cannot_bump_the_version(self):
+        url = reverse("core:home")
+        self.client.get(url)
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed Elsewhere")
+        self.assertNotContains(self.client.get(url), "Renamed Elsewhere")
+        time.sleep(0.1)
+        self.assertContains(self.client.get(url), "Renamed Elsewhere")
+
+    def test_logged_in_users_bypass_the_cache(self):
+        user = get_user_model().objects.create_user(email="c@example.com", username="c", password="x")
+        self.client.force_login(user)
+        url = reverse("core:home")
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertNotIn("X-Page-Cache", response)
+        self.assertContains(response, "c@example.com")
+
+    def test_cached_forms_carry_the_visitors_own_csrf_token(self):
+        url = reverse("catalogue:product_detail", args=[self.product.slug])
+        Client().get(url)
+
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+        variant = self.product.variants.order_by("id").first()
+        response = client.post(
+            reverse("cart:add_to_cart", args=[variant.id]), {"csrfmiddlewaretoken": token, "quantity": 1}
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_records_queries_and_timings_per_url_name(self):
+        self.client.get(reverse("core:home"))
+        self.client.get(reverse("core:home"))
+        home = metrics.snapshot()["core:home"]
+        self.assertEqual(home["total"]["count"], 2)
+        self.assertGreater(home["queries"]["max"], 0)
+        self.assertGreater(home["template"]["max"], 0)
+        self.assertLessEqual(home["db"]["max"], home["total"]["max"])
+
+    @override_settings(VIEW_BUDGETS={"core:home": {"queries": 1}}, VIEW_BUDGET_RAISE=True)
+    def test_budget_raises_when_configured(self):
+        with self.assertRaisesMessage(metrics.BudgetExceeded, "core:home over budget: queries="):
+            self.client.get(reverse("core:home"))
+
+    @override_settings(VIEW_BUDGETS={"core:home": {"queries": 1, "total_ms": 60000}}, VIEW_BUDGET_RAISE=False)
+    def test_budget_logs_and_counts_overruns(self):
+        with self.assertLogs("core.metrics", "WARNING"):
+            self.assertEqual(self.client.get(reverse("core:home")).status_code, 200)
+        self.assertEqual(metrics.snapshot()["core:home"]["budget_exceeded"], {"queries": 1})
+        self.assertIn('view_budget_exceeded_total{view="core:home",budget="queries"} 1', metrics.prometheus())
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_endpoints_are_staff_or_token_only(self):
+        self.client.get(reverse("core:home"))
+        self.assertEqual(self.client.get(reverse("core:request_metrics")).status_code, 302)
+        self.assertEqual(self.client.get(reverse("core:prometheus_metrics")).status_code, 403)
+
+        response = self.client.get(reverse("core:prometheus_metrics"), headers={"Authorization": "Bearer secret"})
+        text = response.content.decode()
+        self.assertIn("# TYPE view_queries histogram", text)
+        self.assertIn('view_duration_seconds_count{view="core:home"} 1', text)
+        self.assertIn('view_queries_bucket{view="core:home",le="+Inf"} 1', text)
+        self.assertRegex(text, r'page_cache_requests_total\{view="core:home",outcome="miss"\} \d+')
+
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", username="admin", password="x")
+        self.client.force_login(admin)
+        data = self.client.get(reverse("core:request_metrics")).json()
+        self.assertEqual(data["views"]["core:home"]["total"]["count"], 1)
+        self.assertIn("miss", data["page_cache"]["core:home"])
+
+    def test_histogram_quantiles(self):
+        histogram = metrics.Histogram((1, 5, 10))
+        for value in (1, 1, 3, 4, 8, 30):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative()), [(1, 2), (5, 4), (10, 5), (float("inf"), 6)])
+        self.assertEqual((histogram.quantile(0.5), histogram.quantile(0.8), histogram.quantile(0.99)), (5, 10, 30))
+
+
+class BenchmarkTests(TestCase):
+    scale = synthetic.Scale(products=30, variants=2, category_fanout=2, category_depth=2, users=4, carts=2, orders=10)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_generates_reproducible_dataset(self):
+        synthetic.generate(self.scale, batch_size=7)
+        self.assertEqual(Category.objects.filter(depth=1).count(), 4)
+        self.assertEqual(Product.objects.filter(min_price__isnull=False, category__depth=1).count(), 30)
+        self.assertEqual(Order.objects.count(), 10)
+        self.assertTrue(CartItem.objects.exists())
+        self.assertTrue(DailySales.objects.exists())
+        names = list(Product.objects.order_by("slug").values_list("name", "base_price"))
+
+        synthetic.delete()
+        self.assertFalse(synthetic.exists())
+        synthetic.generate(self.scale, batch_size=7)
+        self.assertEqual(list(Product.objects.order_by("slug").values_list("name", "base_price")), names)
+
+    def test_run_reports_percentiles_and_rolls_back(self):
+        synthetic.generate(self.scale)
+        orders = Order.objects.count()
+        report = benchmark.run(["product_list", "checkout", "paypal_webhook"], iterations=3, warmup=1)
+
+        self.assertEqual(set(report["scenarios"]), {"product_list", "checkout", "paypal_webhook"})
+        checkout = report["scenarios"]["checkout"]
+        self.assertEqual((checkout["requests"], checkout["errors"]), (3, 0))
+        self.assertLessEqual(checkout["p50_ms"], checkout["p99_ms"])
+        self.assertGreater(checkout["queries"]["min"], 0)
+        webhook = report["scenarios"]["paypal_webhook"]
+        self.assertEqual(webhook["errors"], 0)
+        # Storing the event is one query; applying it (order, stock, rollups) is most of the rest.
+        self.assertGreater(webhook["queries"]["min"], 10)
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+
+class WriteBehindSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_database_row_is_written_on_create_then_behind_the_cache(self):
+        session = SessionStore()
+        session["viewed"] = [1]
+        session.save()
+        self.assertTrue(Session.objects.filter(session_key=session.session_key).exists())
+
+        session = SessionStore(session.session_key)
+        with self.assertNumQueries(0):
+            self.assertEqual(session["viewed"], [1])
+            session.modified = True
+            session.save()
+            session["viewed"] = [1, 2]
+            session.save()
+        self.assertEqual(SessionStore(session.session_key)["viewed"], [1, 2])
+        row = Session.objects.get(session_key=session.session_key)
+        self.assertEqual(session.decode(row.session_data), {"viewed": [1]})
+
+        with override_settings(SESSION_DB_WRITE_INTERVAL=0):
+            session["viewed"] = [1, 2, 3]
+            session.save()
+        row.refresh_from_db()
+        self.assertEqual(session.decode(row.session_data), {"viewed": [1, 2, 3]})
+
+    def test_refuses_a_process_local_cache(self):
+        sessions.check_cache()
+        with override_settings(SESSION_ENGINE="core.sessions"):
+            with self.assertRaisesMessage(ImproperlyConfigured, "needs a cache shared by all workers"):
+                sessions.check_cache()
+            with override_settings(CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "shared": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "sessions"},
+            }, SESSION_CACHE_ALIAS="shared"):
+                sessions.check_cache()
+
+    def test_cache_miss_falls_back_to_the_database(self):
+        session = SessionStore()
+        session["viewed"] = [4]
+        session.save()
+        cache.clear()
+        self.assertEqual(SessionStore(session.session_key)["viewed"], [4])
+
+
+class ThroughputBenchmarkTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a file-backed test database, e.g. DJANGO_TEST_DB_NAME=test_db.sqlite3")
+
+    def test_concurrent_add_to_cart(self):
+        synthetic.generate(synthetic.Scale(products=5, category_fanout=1, category_depth=1, users=0, orders=0))
+        result = benchmark.throughput(workers=3, requests=4)
+        self.assertEqual((result["guest"]["requests"], result["guest"]["errors"]), (12, 0))
+        self.assertEqual(result["customer"]["errors"], 0)
+        self.assertEqual(Cart.objects.filter(user__isnull=True).count(), 0)
+        self.assertFalse(Session.objects.exists())
+
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        runs = benchmark.sqlite_comparison(workers=2, requests=2)
+        self.assertEqual(set(runs), {"default", "tuned"})
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], journal_mode)
+
+
+class SQLiteTuningTests(TestCase):
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+
+    def test_new_connections_get_the_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 2)
+        self.assertEqual(connection.settings_dict["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+
+    def test_wal_is_opt_in(self):
+        self.assertNotIn("journal_mode", db.pragmas())
+        with override_settings(SQLITE_WAL=True):
+            self.assertEqual(db.pragmas(), {**db.PRAGMAS, "journal_mode": "wal", "synchronous": "normal"})
+
+
+class XlsxExportTests(TestCase):
+    def test_non_finite_numbers_are_written_as_text(self):
+        rows = [[float("nan"), float("inf"), Decimal("-Infinity"), Decimal("2.50")]]
+        expected = [("nan", "inf", "-inf", 2.5)]
+        workbook = openpyxl.load_workbook(BytesIO(b"".join(xlsx_chunks(["a", "b", "c", "d"], rows))))
+        self.assertEqual(list(workbook.active.iter_rows(min_row=2, values_only=True)), expected)
+
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as handle:
+            write_xlsx(handle.name, ["a", "b", "c", "d"], rows)
+            workbook = openpyxl.load_workbook(handle.name)
+        self.assertEqual(list(workbook.active.iter_rows(min_row=2, values_only=True)), expected)
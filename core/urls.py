@@ -6,4 +6,6 @@ app_name = "core"
 urlpatterns = [
     path("", views.home, name="home"),
     path("page/<slug:slug>/", views.static_page, name="static_page"),
+    path("metrics/", views.request_metrics, name="request_metrics"),
+    path("metrics/prometheus/", views.prometheus_metrics, name="prometheus_metrics"),
 ]
@@ -1,34 +1,26 @@
+import hmac
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from . import metrics, page_cache
 from .models import StaticPage
+from .page_cache import cache_anonymous_page
 from catalogue.models import Product, Category
+from catalogue.pagination import TOP_RATED, paginate
 
+@cache_anonymous_page
 def home(request):
-    featured_products = Product.objects.filter(is_featured=True, is_active=True).order_by("-rating")
-    high_rated_products = Product.objects.filter(is_active=True).order_by("-rating")
+    featured_products = Product.objects.filter(is_featured=True, is_active=True).for_listing().order_by("-rating")
+    high_rated_products = Product.objects.filter(is_active=True).for_listing().order_by("-rating")
     featured_categories = Category.objects.filter(is_featured=True)[:6]
     
-    # Pagination for featured products
-    paginator_featured = Paginator(featured_products, 8)
-    page_featured = request.GET.get('page_featured')
-    
-    try:
-        featured_products = paginator_featured.page(page_featured)
-    except PageNotAnInteger:
-        featured_products = paginator_featured.page(1)
-    except EmptyPage:
-        featured_products = paginator_featured.page(paginator_featured.num_pages)
-    
-    # Pagination for high rated products
-    paginator_rated = Paginator(high_rated_products, 8)
-    page_rated = request.GET.get('page_rated')
-    
-    try:
-        high_rated_products = paginator_rated.page(page_rated)
-    except PageNotAnInteger:
-        high_rated_products = paginator_rated.page(1)
-    except EmptyPage:
-        high_rated_products = paginator_rated.page(paginator_rated.num_pages)
+    featured_products = paginate(
+        request, featured_products, 8, TOP_RATED, page_param="page_featured", cursor_param="cursor_featured"
+    )
+    high_rated_products = paginate(
+        request, high_rated_products, 8, TOP_RATED, page_param="page_rated", cursor_param="cursor_rated"
+    )
     
     return render(request, "core/home.html", {
         "featured_products": featured_products,
@@ -40,3 +32,19 @@ def home(request):
 def static_page(request, slug):
     page = get_object_or_404(StaticPage, slug=slug)
     return render(request, "core/static_page.html", {"page": page})
+
+
+@staff_member_required
+def request_metrics(request):
+    return JsonResponse({"views": metrics.snapshot(), "page_cache": page_cache.stats()})
+
+
+def prometheus_metrics(request):
+    # Scrapers authenticate with METRICS_TOKEN as a bearer token; staff can read it from a browser.
+    token = getattr(settings, "METRICS_TOKEN", "")
+    header = request.headers.get("Authorization", "")
+    if not (request.user.is_active and request.user.is_staff) and not (
+        token and hmac.compare_digest(header, f"Bearer {token}")
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,12 @@
+import datetime
 from django.contrib import admin
-from .models import Order, OrderItem
+from django.db.models import Sum
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .exports import orders_response
+from .models import DailyCategorySales, DailySales, DailyVariantSales, Order, OrderItem
+
+DASHBOARD_PERIODS = (7, 30, 90, 365)
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -10,3 +17,69 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ("transaction_id", "user", "status", "total_amount", "created_at")
     inlines = [OrderItemInline]
     list_filter = ("status",)
+    date_hierarchy = "created_at"
+    actions = ["export_csv", "export_xlsx"]
+
+    # The changelist's status and date filters narrow the queryset these actions receive;
+    # "select all" then exports the whole filtered range without listing it first.
+    @admin.action(description="Export selected orders as CSV")
+    def export_csv(self, request, queryset):
+        return orders_response(queryset, "csv")
+
+    @admin.action(description="Export selected orders as XLSX")
+    def export_xlsx(self, request, queryset):
+        return orders_response(queryset, "xlsx")
+
+
+@admin.register(DailySales)
+class SalesDashboardAdmin(admin.ModelAdmin):
+    """Read-only sales charts drawn from the daily rollups, never from OrderItem."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            days = int(request.GET.get("days", 30))
+        except ValueError:
+            days = 30
+        days = days if days in DASHBOARD_PERIODS else 30
+        end = timezone.localdate()
+        start = end - datetime.timedelta(days=days - 1)
+
+        recorded = {row.day: row for row in DailySales.objects.filter(day__range=(start, end))}
+        dates = [start + datetime.timedelta(days=offset) for offset in range(days)]
+        series = [recorded.get(day) or DailySales(day=day) for day in dates]
+        peak = max((row.revenue for row in series), default=0) or 1
+        chart = [(row, round(100 * row.revenue / peak)) for row in series]
+
+        def top(model, *fields):
+            return (
+                model.objects.filter(day__range=(start, end)).values(*fields)
+                .annotate(revenue=Sum("revenue"), units=Sum("units"), orders=Sum("orders"))
+                .order_by("-revenue")[:10]
+            )
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title="Sales dashboard",
+            days=days,
+            periods=DASHBOARD_PERIODS,
+            chart=chart,
+            totals={
+                "revenue": sum(row.revenue for row in series),
+                "units": sum(row.units for row in series),
+                "orders": sum(row.orders for row in series),
+            },
+            categories=top(DailyCategorySales, "category__name"),
+            variants=top(DailyVariantSales, "variant__sku", "variant__product__name"),
+            **(extra_context or {}),
+        )
+        return TemplateResponse(request, "admin/orders/dailysales/dashboard.html", context)
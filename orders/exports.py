@@ -0,0 +1,67 @@
+import datetime
+from django.utils import timezone
+from core.exports import csv_response, write_csv, write_xlsx, xlsx_response
+from .models import Order
+
+# One row per order line, with the order's own columns repeated.
+HEADER = (
+    "transaction_id", "created_at", "status", "customer_email", "total_amount", "mobile_money_reference",
+    "sku", "product", "variant", "price", "quantity", "line_total",
+)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def filter_orders(queryset=None, start=None, end=None, statuses=()):
+    """
+    Orders placed between the dates ``start`` and ``end`` (both inclusive,
+    in the current time zone) with one of ``statuses``. Bounds are applied to
+    created_at directly so the (status, created_at) and created_at indexes apply.
+    """
+    queryset = Order.objects.all() if queryset is None else queryset
+    if start:
+        queryset = queryset.filter(created_at__gte=_day_start(start))
+    if end:
+        queryset = queryset.filter(created_at__lt=_day_start(end + datetime.timedelta(days=1)))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def export_items(orders):
+    """
+    HEADER's columns for ``orders``, one row per order line. Items are LEFT
+    JOINed so an order without lines still gets a row, with empty line columns.
+    """
+    return orders.values_list(
+        "transaction_id", "created_at", "status", "user__email", "total_amount", "mobile_money_reference",
+        "items__variant__sku", "items__variant__product__name", "items__variant__name",
+        "items__price", "items__quantity",
+    ).order_by("id", "items__id")
+
+
+def export_rows(orders, chunk_size=2000):
+    """Yield HEADER-ordered rows for ``orders``, reading them in chunks of ``chunk_size``."""
+    for row in export_items(orders).iterator(chunk_size=chunk_size):
+        transaction_id, created_at, status, email, total, reference, sku, product, variant, price, quantity = row
+        yield [
+            transaction_id, timezone.localtime(created_at), status, email or "", total, reference,
+            sku or "", product or "", variant or "",
+            price, quantity, price * quantity if price is not None else None,
+        ]
+
+
+def export_orders(path, orders, fmt="csv", chunk_size=2000):
+    rows = export_rows(orders, chunk_size)
+    if fmt == "xlsx":
+        return write_xlsx(path, HEADER, rows, sheet="Orders")
+    return write_csv(path, HEADER, rows)
+
+
+def orders_response(orders, fmt="csv"):
+    filename = f"orders-{timezone.localdate():%Y%m%d}.{fmt}"
+    if fmt == "xlsx":
+        return xlsx_response(filename, HEADER, export_rows(orders), sheet="Orders")
+    return csv_response(filename, HEADER, export_rows(orders))
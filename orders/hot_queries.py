@@ -0,0 +1,37 @@
+import datetime
+from core.query_plans import hot_query
+from .exports import export_items, filter_orders
+from .models import Order, OrderItem
+
+
+@hot_query("orders:order_detail")
+def order_detail():
+    return Order.objects.filter(transaction_id="ABCDEF123456", user_id=1)
+
+
+@hot_query("orders:user_history")
+def user_history():
+    return Order.objects.filter(user_id=1).order_by("-created_at")[:20]
+
+
+@hot_query("orders:stock_reservations")
+def stock_reservations():
+    return OrderItem.objects.filter(
+        variant_id__in=[1, 2, 3], order__status="pending", order__created_at__gte=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc),
+    ).values("variant_id")
+
+
+@hot_query("orders:admin_status_filter")
+def admin_status_filter():
+    return Order.objects.filter(status="paid").order_by("-created_at")[:100]
+
+
+@hot_query("orders:export_range")
+def export_range():
+    return filter_orders(start=datetime.date(2025, 1, 1), end=datetime.date(2025, 12, 31))
+
+
+@hot_query("orders:export_items")
+def export_lines():
+    orders = filter_orders(start=datetime.date(2025, 1, 1), end=datetime.date(2025, 12, 31), statuses=["paid"])
+    return export_items(orders)
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+def mark_paid_orders_committed(apps, schema_editor):
+    # Stock for orders paid before this field existed was already taken.
+    Order = apps.get_model("orders", "Order")
+    Order.objects.filter(status="paid").update(stock_committed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_committed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_paid_orders_committed, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,7 @@ import random
 import string
 from django.db import models
 from django.conf import settings
-from catalogue.models import ProductVariant
+from catalogue.models import Category, ProductVariant
 
 def generate_transaction_id():
     return "".join(random.choices(string.ascii_uppercase + string.digits, k=12))
@@ -21,10 +21,28 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     mobile_money_reference = models.CharField(max_length=100, blank=True)
+    stock_committed = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="orders_order_user_idx"),
+            models.Index(fields=["status", "created_at"], name="orders_order_status_idx"),
+            models.Index(fields=["created_at"], name="orders_order_created_idx"),
+        ]
 
     def __str__(self):
         return f"Order {self.transaction_id}"
 
+    def save(self, *args, **kwargs):
+        # stock_committed is only set by commit_stock()'s conditional UPDATE; a
+        # full save of an instance loaded before that must not write it back.
+        if not self._state.adding:
+            fields = kwargs.get("update_fields")
+            if fields is None:
+                fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs["update_fields"] = [name for name in fields if name != "stock_committed"]
+        super().save(*args, **kwargs)
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
@@ -34,3 +52,42 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.variant} x {self.quantity}"
+
+
+class SalesRollup(models.Model):
+    """Paid-order totals for one day, by the local date the order was placed; see orders.rollups."""
+
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ["day"]
+
+
+class DailySales(SalesRollup):
+    class Meta(SalesRollup.Meta):
+        verbose_name_plural = "Daily sales"
+        constraints = [models.UniqueConstraint(fields=["day"], name="orders_dailysales_day_uniq")]
+
+
+class DailyCategorySales(SalesRollup):
+    category = models.ForeignKey(Category, related_name="+", on_delete=models.CASCADE)
+
+    class Meta(SalesRollup.Meta):
+        verbose_name_plural = "Daily category sales"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "category"], name="orders_dailycategorysales_uniq"),
+        ]
+
+
+class DailyVariantSales(SalesRollup):
+    variant = models.ForeignKey(ProductVariant, related_name="+", on_delete=models.CASCADE)
+
+    class Meta(SalesRollup.Meta):
+        verbose_name_plural = "Daily variant sales"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "variant"], name="orders_dailyvariantsales_uniq"),
+        ]
@@ -0,0 +1,158 @@
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+import numpy as np
+from .exports import filter_orders
+from .models import DailyCategorySales, DailySales, DailyVariantSales, OrderItem
+
+CENT = Decimal("0.01")
+
+
+def _increment(model, day, totals, key=None):
+    """
+    Add ``{key_id: (revenue, units)}`` to the ``day`` rows of ``model``,
+    creating missing rows first. Each key also gains one order. The whole
+    batch is a single UPDATE with CASE arms, so concurrent orders add up
+    in the database rather than overwriting each other.
+    """
+    if key is None:
+        (revenue, units), = totals.values()
+        model.objects.bulk_create([model(day=day)], ignore_conflicts=True)
+        model.objects.filter(day=day).update(
+            revenue=F("revenue") + revenue, units=F("units") + units, orders=F("orders") + 1,
+        )
+        return
+
+    model.objects.bulk_create([model(day=day, **{f"{key}_id": pk}) for pk in totals], ignore_conflicts=True)
+
+    def case(field, position):
+        return Case(
+            *[When(**{f"{key}_id": pk}, then=F(field) + values[position]) for pk, values in totals.items()],
+            default=F(field),
+            output_field=model._meta.get_field(field),
+        )
+
+    model.objects.filter(day=day, **{f"{key}_id__in": totals}).update(
+        revenue=case("revenue", 0), units=case("units", 1), orders=F("orders") + 1,
+    )
+
+
+def record_order(order):
+    """Add a newly paid order to the daily rollups. Call once per order (see orders.signals)."""
+    day = timezone.localdate(order.created_at)
+    lines = list(
+        order.items.order_by()
+        .values("variant_id", "variant__product__category_id")
+        .annotate(revenue=Sum(F("price") * F("quantity")), units=Sum("quantity"))
+    )
+    if not lines:
+        return
+
+    variants, categories = {}, {}
+    revenue_total, units_total = 0, 0
+    for line in lines:
+        revenue_total += line["revenue"]
+        units_total += line["units"]
+        variants[line["variant_id"]] = (line["revenue"], line["units"])
+        revenue, units = categories.get(line["variant__product__category_id"], (0, 0))
+        categories[line["variant__product__category_id"]] = (revenue + line["revenue"], units + line["units"])
+
+    with transaction.atomic():
+        _increment(DailySales, day, {None: (revenue_total, units_total)})
+        _increment(DailyCategorySales, day, categories, key="category")
+        _increment(DailyVariantSales, day, variants, key="variant")
+
+
+def _group(keys, *values):
+    """Unique rows of the 2-D int array ``keys`` and the per-row sums of each of ``values``."""
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = []
+    for column in values:
+        total = np.zeros(len(unique), dtype=np.int64)
+        np.add.at(total, inverse, column)
+        sums.append(total)
+    return unique, sums
+
+
+def _accumulate(totals, keys, orders, cents, units):
+    """Fold one chunk of order lines into ``totals[key] = [cents, units, orders]``."""
+    unique, (cents, units) = _group(keys, cents, units)
+    # An order counts once per key however many of its lines share that key.
+    per_order, _ = _group(np.column_stack([keys, orders]))
+    counted, (order_counts,) = _group(per_order[:, :-1], np.ones(len(per_order), dtype=np.int64))
+    order_counts = dict(zip(map(tuple, counted.tolist()), order_counts.tolist()))
+
+    for key, key_cents, key_units in zip(map(tuple, unique.tolist()), cents.tolist(), units.tolist()):
+        entry = totals.setdefault(key, [0, 0, 0])
+        entry[0] += key_cents
+        entry[1] += key_units
+        entry[2] += order_counts[key]
+
+
+def rebuild(start=None, end=None, chunk_size=5000, progress=None):
+    """
+    Recompute the rollups for paid orders placed from ``start`` to ``end``
+    (inclusive, all history when omitted). Orders are read in id-ordered
+    chunks and each chunk's lines are summed with NumPy, so memory grows
+    with the number of rollup rows rather than with the number of orders.
+    Returns the number of orders aggregated.
+    """
+    orders = filter_orders(start=start, end=end, statuses=["paid"]).order_by("id")
+    day_totals, category_totals, variant_totals = {}, {}, {}
+    last_id, seen = 0, 0
+    while True:
+        chunk = list(orders.filter(id__gt=last_id).values_list("id", "created_at")[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        seen += len(chunk)
+        days = {order_id: timezone.localdate(created_at).toordinal() for order_id, created_at in chunk}
+
+        lines = list(
+            OrderItem.objects.filter(order_id__in=days)
+            .values_list("order_id", "variant_id", "variant__product__category_id", "price", "quantity")
+        )
+        if lines:
+            order_ids, variant_ids, category_ids, prices, quantities = zip(*lines)
+            order_ids = np.array(order_ids, dtype=np.int64)
+            day_ids = np.array([days[order_id] for order_id in order_ids.tolist()], dtype=np.int64)
+            quantities = np.array(quantities, dtype=np.int64)
+            cents = np.rint(np.array(prices, dtype=np.float64) * 100).astype(np.int64) * quantities
+
+            _accumulate(day_totals, day_ids[:, None], order_ids, cents, quantities)
+            _accumulate(
+                category_totals, np.column_stack([day_ids, np.array(category_ids, dtype=np.int64)]),
+                order_ids, cents, quantities,
+            )
+            _accumulate(
+                variant_totals, np.column_stack([day_ids, np.array(variant_ids, dtype=np.int64)]),
+                order_ids, cents, quantities,
+            )
+        if progress:
+            progress(seen)
+
+    def rows(model, totals, key=None):
+        for (day, *rest), (cents, units, count) in sorted(totals.items()):
+            fields = {f"{key}_id": rest[0]} if key else {}
+            yield model(
+                day=datetime.date.fromordinal(day), revenue=(Decimal(cents) * CENT).quantize(CENT),
+                units=units, orders=count, **fields,
+            )
+
+    day_range = {}
+    if start:
+        day_range["day__gte"] = start
+    if end:
+        day_range["day__lte"] = end
+    with transaction.atomic():
+        for model, totals, key in (
+            (DailySales, day_totals, None),
+            (DailyCategorySales, category_totals, "category"),
+            (DailyVariantSales, variant_totals, "variant"),
+        ):
+            model.objects.filter(**day_range).delete()
+            model.objects.bulk_create(rows(model, totals, key), batch_size=1000)
+    return seen
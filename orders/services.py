@@ -0,0 +1,104 @@
+import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+from catalogue.models import Product, ProductVariant
+from core.page_cache import bump_catalogue_version
+from .models import Order, OrderItem
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def reserved_stock(variant_ids):
+    """
+    Units of each variant held by pending orders: stock only drops once an
+    order is paid, so until then checkout counts these against it. Orders
+    left unpaid for STOCK_RESERVATION_MINUTES stop holding anything.
+    """
+    since = timezone.now() - datetime.timedelta(minutes=getattr(settings, "STOCK_RESERVATION_MINUTES", 30))
+    return dict(
+        OrderItem.objects.filter(variant_id__in=variant_ids, order__status="pending", order__created_at__gte=since)
+        .order_by().values("variant_id").annotate(total=Sum("quantity")).values_list("variant_id", "total")
+    )
+
+
+def place_order(user, cart):
+    """
+    Turn ``cart`` into a pending Order in one transaction.
+
+    Cart lines are loaded together with their variant and product in a single
+    query that also locks the variant rows (SELECT ... FOR UPDATE; SQLite
+    takes the write lock when the IMMEDIATE transaction begins). Stock, less
+    what other pending orders hold, is checked and the new order's lines are
+    written while the lock is held, so two checkouts racing for the last unit
+    cannot both get through.
+    """
+    with transaction.atomic():
+        lines = list(
+            cart.items.select_related("variant__product")
+            .select_for_update(of=("variant",))
+            .order_by("variant_id")
+        )
+        if not lines:
+            raise CheckoutError("Your cart is empty.")
+
+        reserved = reserved_stock([line.variant_id for line in lines])
+        short = [
+            line.variant for line in lines
+            if line.variant.stock - reserved.get(line.variant_id, 0) < line.quantity
+        ]
+        if short:
+            names = ", ".join(variant.product.name for variant in short)
+            raise CheckoutError(f"Not enough stock for: {names}.")
+
+        total = sum((line.subtotal for line in lines), Decimal("0"))
+        order = Order.objects.create(user=user, total_amount=total)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, variant=line.variant, price=line.price, quantity=line.quantity)
+            for line in lines
+        ])
+        cart.items.all().delete()
+    return order
+
+
+def commit_stock(order):
+    """
+    Take a paid order's quantities out of stock, at most once per order.
+
+    The ``stock_committed`` flag is claimed with a conditional UPDATE (and
+    Order.save() never writes it), so re-saving a paid order, even from a
+    stale copy, or two webhooks racing, decrements only once.
+    All variants are then decremented by a single UPDATE whose CASE arms
+    only fire while ``stock >= quantity``, which keeps the check and the
+    write in the database instead of a Python read-modify-write.
+    """
+    with transaction.atomic():
+        claimed = Order.objects.filter(pk=order.pk, stock_committed=False).update(stock_committed=True)
+        if not claimed:
+            return False
+        order.stock_committed = True
+
+        quantities = dict(
+            order.items.order_by().values("variant_id").annotate(total=Sum("quantity")).values_list("variant_id", "total")
+        )
+        if quantities:
+            ProductVariant.objects.filter(id__in=quantities).update(
+                stock=Case(
+                    *[
+                        When(id=variant_id, stock__gte=quantity, then=F("stock") - quantity)
+                        for variant_id, quantity in quantities.items()
+                    ],
+                    default=F("stock"),
+                    output_field=ProductVariant._meta.get_field("stock"),
+                )
+            )
+            Product.objects.filter(
+                pk__in=ProductVariant.objects.filter(id__in=quantities).values("product_id")
+            ).refresh_summary()
+            # Bulk UPDATEs send no signals; stock feeds the in-stock listings.
+            bump_catalogue_version()
+    return True
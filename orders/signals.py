@@ -1,12 +1,20 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Order, OrderItem
+from catalogue.recommendations import mark_stale
+from .models import Order
+from .rollups import record_order
+from .services import commit_stock
 
 @receiver(post_save, sender=Order)
 def handle_order_paid(sender, instance, created, **kwargs):
     if not created and instance.status == "paid":
-        for item in instance.items.select_related("variant"):
-            variant = item.variant
-            if variant.stock >= item.quantity:
-                variant.stock -= item.quantity
-                variant.save()
+        # commit_stock claims the order once in the database (the in-memory flag
+        # may be stale), so the rollups and recommendations count it once too.
+        with transaction.atomic():
+            if commit_stock(instance):
+                record_order(instance)
+                # Only orders holding two or more products change who is bought together.
+                products = set(instance.items.values_list("variant__product_id", flat=True))
+                if len(products) > 1:
+                    mark_stale(products)
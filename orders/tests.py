@@ -1,3 +1,397 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO, StringIO
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from cart.models import CartItem
+from catalogue.models import Category, Product, ProductVariant
+from .exports import HEADER, export_rows, filter_orders
+from .models import DailyCategorySales, DailySales, DailyVariantSales, Order, OrderItem
+from .services import CheckoutError, place_order
 
-# Create your tests here.
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="buyer@example.com", username="buyer", password="x")
+        category = Category.objects.create(name="Bags", slug="bags")
+        cls.variants = []
+        for i in range(20):
+            product = Product.objects.create(category=category, name=f"Bag {i}", base_price=100)
+            cls.variants.append(ProductVariant.objects.create(
+                product=product, name="One size", sku=f"bag-{i}", price_adjustment=5, stock=10,
+            ))
+
+    def fill_cart(self, variants, quantity=2):
+        for variant in variants:
+            CartItem.objects.create(cart=self.user.cart, variant=variant, quantity=quantity)
+
+    def test_creates_order_and_empties_cart(self):
+        self.fill_cart(self.variants[:3])
+        order = place_order(self.user, self.user.cart)
+
+        self.assertEqual(order.total_amount, Decimal("630.00"))
+        self.assertEqual(
+            sorted(order.items.values_list("variant_id", "price", "quantity")),
+            [(variant.id, Decimal("105.00"), 2) for variant in self.variants[:3]],
+        )
+        self.assertFalse(self.user.cart.items.exists())
+
+    def test_query_count_is_constant_in_cart_size(self):
+        def checkout_queries(variants):
+            self.fill_cart(variants)
+            with CaptureQueriesContext(connection) as queries:
+                place_order(self.user, self.user.cart)
+            return len(queries)
+
+        self.assertEqual(checkout_queries(self.variants[:2]), checkout_queries(self.variants[2:]))
+
+    def test_refuses_to_oversell(self):
+        self.fill_cart(self.variants[:2], quantity=11)
+        with self.assertRaisesMessage(CheckoutError, "Bag 0, Bag 1"):
+            place_order(self.user, self.user.cart)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.user.cart.items.count(), 2)
+
+    def test_pending_orders_hold_stock(self):
+        other = get_user_model().objects.create_user(email="other@example.com", username="other", password="x")
+        CartItem.objects.create(cart=other.cart, variant=self.variants[0], quantity=6)
+        place_order(other, other.cart)
+
+        self.fill_cart(self.variants[:1], quantity=5)
+        with self.assertRaisesMessage(CheckoutError, "Bag 0"):
+            place_order(self.user, self.user.cart)
+
+        # Unpaid past the reservation window, the first order no longer holds anything.
+        Order.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(place_order(self.user, self.user.cart).items.get().quantity, 5)
+
+    def test_view_redirects_to_order(self):
+        self.fill_cart(self.variants[:1])
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("orders:checkout"))
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse("orders:order_detail", args=[order.transaction_id]))
+
+    def test_view_shows_checkout_errors(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("orders:checkout"))
+        self.assertContains(response, "Your cart is empty.")
+
+
+def make_paid_ready_order(user, variant, quantity):
+    order = Order.objects.create(user=user, total_amount=variant.final_price * quantity)
+    OrderItem.objects.create(order=order, variant=variant, price=variant.final_price, quantity=quantity)
+    return order
+
+
+class StockCommitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Belts", slug="belts")
+        product = Product.objects.create(category=category, name="Belt", base_price=30)
+        cls.variant = ProductVariant.objects.create(product=product, name="M", sku="belt-m", stock=5)
+        cls.other = ProductVariant.objects.create(product=product, name="L", sku="belt-l", stock=1)
+
+    def test_decrements_once_per_order(self):
+        order = make_paid_ready_order(None, self.variant, 2)
+        OrderItem.objects.create(order=order, variant=self.variant, price=30, quantity=1)
+        order.status = "paid"
+        order.save()
+        order.save()
+        Order.objects.get(pk=order.pk).save()
+
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 2)
+
+    def test_stale_copies_of_an_order_decrement_once(self):
+        order = make_paid_ready_order(None, self.variant, 1)
+        first, second = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+        for copy in (first, second):
+            copy.status = "paid"
+            copy.save()
+
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 4)
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_batches_all_lines_into_one_update(self):
+        order = make_paid_ready_order(None, self.variant, 1)
+        OrderItem.objects.create(order=order, variant=self.other, price=30, quantity=1)
+        order.status = "paid"
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        updates = [q for q in queries if q["sql"].startswith('UPDATE "catalogue_productvariant"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            dict(ProductVariant.objects.values_list("sku", "stock")), {"belt-m": 4, "belt-l": 0}
+        )
+
+    def test_refreshes_product_stock_summary(self):
+        order = make_paid_ready_order(None, self.other, 1)
+        order.status = "paid"
+        order.save()
+        product = Product.objects.get(pk=self.other.product_id)
+        self.assertEqual((product.total_stock, product.in_stock), (5, True))
+
+        order = make_paid_ready_order(None, self.variant, 5)
+        order.status = "paid"
+        order.save()
+        product.refresh_from_db()
+        self.assertEqual((product.total_stock, product.in_stock), (0, False))
+
+    def test_leaves_short_lines_untouched(self):
+        order = make_paid_ready_order(None, self.other, 3)
+        order.status = "paid"
+        order.save()
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.stock, 1)
+
+
+class StockCommittedMigrationTests(TransactionTestCase):
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_orders_paid_before_the_flag_are_not_committed_again(self):
+        category = Category.objects.create(name="Scarves", slug="scarves")
+        product = Product.objects.create(category=category, name="Scarf", base_price=20)
+        variant = ProductVariant.objects.create(product=product, name="One", sku="scarf", stock=4)
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        self.addCleanup(self.migrate, latest)
+
+        apps = self.migrate([("orders", "0001_initial")])
+        legacy = apps.get_model("orders", "Order").objects.create(status="paid", total_amount=20)
+        apps.get_model("orders", "OrderItem").objects.create(
+            order=legacy, variant_id=variant.pk, price=20, quantity=1
+        )
+        self.migrate(latest)
+
+        order = Order.objects.get(pk=legacy.pk)
+        self.assertTrue(order.stock_committed)
+        order.save()
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock, 4)
+        self.assertFalse(DailySales.objects.exists())
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="buyer@example.com", username="buyer", password="x")
+        category = Category.objects.create(name="Hats", slug="hats")
+        product = Product.objects.create(category=category, name="Cap", base_price=20)
+        cls.variant = ProductVariant.objects.create(product=product, name="Blue", sku="CAP-B", stock=50)
+        cls.march = make_paid_ready_order(cls.user, cls.variant, 2)
+        cls.april = make_paid_ready_order(None, cls.variant, 1)
+        utc = datetime.timezone.utc
+        Order.objects.filter(pk=cls.march.pk).update(
+            status="paid", created_at=datetime.datetime(2025, 3, 31, 23, 30, tzinfo=utc),
+        )
+        Order.objects.filter(pk=cls.april.pk).update(created_at=datetime.datetime(2025, 4, 1, tzinfo=utc))
+
+    def test_filters_by_day_and_status(self):
+        march = datetime.date(2025, 3, 31)
+        self.assertEqual(list(filter_orders(start=march, end=march)), [self.march])
+        self.assertEqual(list(filter_orders(start=march, statuses=["pending"])), [self.april])
+
+        rows = list(export_rows(filter_orders(end=march)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], self.march.transaction_id)
+        self.assertEqual(rows[0][3], "buyer@example.com")
+        self.assertEqual(rows[0][6:], ["CAP-B", "Cap", "Blue", Decimal("20.00"), 2, Decimal("40.00")])
+
+    def test_orders_without_items_are_kept(self):
+        empty = Order.objects.create(user=self.user)
+        rows = list(export_rows(Order.objects.filter(pk=empty.pk)))
+        self.assertEqual(rows, [[
+            empty.transaction_id, timezone.localtime(empty.created_at), "pending", "buyer@example.com",
+            Decimal("0.00"), "", "", "", "", None, None, None,
+        ]])
+
+    def test_command_writes_xlsx(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f"{directory}/orders.xlsx"
+        out = StringIO()
+        call_command("export_orders", path, "--from", "2025-04-01", stdout=out)
+        self.assertIn("Exported 1 order lines", out.getvalue())
+
+        sheet = openpyxl.load_workbook(path, read_only=True).active
+        header, row = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(header, HEADER)
+        self.assertEqual(row[:3], (self.april.transaction_id, datetime.datetime(2025, 4, 1), "pending"))
+        self.assertEqual(row[-1], 20)
+
+    def test_admin_action_streams_csv(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", username="admin", password="x")
+        self.client.force_login(admin)
+        response = self.client.post(reverse("admin:orders_order_changelist") + "?status__exact=paid", {
+            "action": "export_csv", "select_across": 1, "index": 0, "_selected_action": [self.march.pk],
+        })
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ",".join(HEADER))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(self.march.transaction_id + ",2025-03-31 23:30:00+00:00,paid"))
+
+    def test_admin_action_streams_xlsx(self):
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", username="admin", password="x")
+        self.client.force_login(admin)
+        response = self.client.post(reverse("admin:orders_order_changelist"), {
+            "action": "export_xlsx", "select_across": 1, "index": 0, "_selected_action": [self.march.pk],
+        })
+        self.assertTrue(response.streaming)
+        workbook = openpyxl.load_workbook(BytesIO(b"".join(response.streaming_content)), read_only=True)
+        self.assertEqual(workbook.active.title, "Orders")
+        header, *rows = workbook.active.iter_rows(values_only=True)
+        self.assertEqual(header, HEADER)
+        self.assertEqual(
+            [row[:3] + row[-3:] for row in rows],
+            [(self.march.transaction_id, datetime.datetime(2025, 3, 31, 23, 30), "paid", 20, 2, 40),
+             (self.april.transaction_id, datetime.datetime(2025, 4, 1), "pending", 20, 1, 20)],
+        )
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="buyer@example.com", username="buyer", password="x")
+        shirts = Category.objects.create(name="Shirts", slug="shirts")
+        socks = Category.objects.create(name="Socks", slug="socks")
+        shirt = Product.objects.create(category=shirts, name="Shirt", base_price=40)
+        sock = Product.objects.create(category=socks, name="Sock", base_price=Decimal("4.50"))
+        cls.small = ProductVariant.objects.create(product=shirt, name="S", sku="SHIRT-S", stock=100)
+        cls.large = ProductVariant.objects.create(product=shirt, name="L", sku="SHIRT-L", stock=100)
+        cls.sock = ProductVariant.objects.create(product=sock, name="One", sku="SOCK", stock=100)
+
+    def pay(self, *lines):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, variant=variant, price=variant.final_price, quantity=quantity)
+            for variant, quantity in lines
+        ])
+        order.status = "paid"
+        order.save()
+        return order
+
+    def snapshot(self):
+        return (
+            list(DailySales.objects.values_list("day", "revenue", "units", "orders")),
+            sorted(DailyCategorySales.objects.values_list("day", "category__slug", "revenue", "units", "orders")),
+            sorted(DailyVariantSales.objects.values_list("day", "variant__sku", "revenue", "units", "orders")),
+        )
+
+    def test_paid_orders_update_rollups_once(self):
+        order = self.pay((self.small, 1), (self.large, 2), (self.sock, 3))
+        self.pay((self.small, 1))
+        order.save()
+
+        today = timezone.localdate()
+        days, categories, variants = self.snapshot()
+        self.assertEqual(days, [(today, Decimal("173.50"), 7, 2)])
+        self.assertEqual(categories, [
+            (today, "shirts", Decimal("160.00"), 4, 2), (today, "socks", Decimal("13.50"), 3, 1),
+        ])
+        self.assertEqual(variants[1], (today, "SHIRT-S", Decimal("80.00"), 2, 2))
+
+    def test_backfill_matches_incremental_rollups(self):
+        self.pay((self.small, 1), (self.sock, 2))
+        self.pay((self.small, 2), (self.large, 1))
+        self.pay((self.sock, 5))
+        Order.objects.create(user=self.user)
+        expected = self.snapshot()
+
+        DailySales.objects.all().delete()
+        DailyCategorySales.objects.all().delete()
+        out = StringIO()
+        call_command("backfill_sales", "--chunk-size", "2", stdout=out)
+        self.assertIn("Rolled up 3 paid orders", out.getvalue())
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_dashboard_reads_only_rollups(self):
+        self.pay((self.small, 1), (self.sock, 2))
+        admin = get_user_model().objects.create_superuser(email="admin@example.com", username="admin", password="x")
+        self.client.force_login(admin)
+        url = reverse("admin:orders_dailysales_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"days": 7})
+        self.assertContains(response, "Sales dashboard")
+        self.assertContains(response, "SHIRT-S")
+        self.assertFalse([query for query in queries if "orders_orderitem" in query["sql"]])
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a file-backed test database, e.g. DJANGO_TEST_DB_NAME=test_db.sqlite3")
+
+    def test_parallel_checkouts_for_the_last_unit(self):
+        category = Category.objects.create(name="Rings", slug="rings")
+        product = Product.objects.create(category=category, name="Ring", base_price=50)
+        variant = ProductVariant.objects.create(product=product, name="One", sku="ring", stock=1)
+        users = [
+            get_user_model().objects.create_user(email=f"buyer{i}@example.com", username=f"buyer{i}", password="x")
+            for i in range(2)
+        ]
+        for user in users:
+            CartItem.objects.create(cart=user.cart, variant=variant, quantity=1)
+
+        def checkout(user):
+            try:
+                place_order(user, user.cart)
+                return "ok"
+            except CheckoutError:
+                return "short"
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            outcomes = sorted(pool.map(checkout, users))
+
+        self.assertEqual(outcomes, ["ok", "short"])
+        self.assertEqual(OrderItem.objects.filter(variant=variant).count(), 1)
+
+
+class StockCommitConcurrencyTests(TransactionTestCase):
+    workers = 8
+    orders = 40
+    stock = 25
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("needs a file-backed test database, e.g. DJANGO_TEST_DB_NAME=test_db.sqlite3")
+
+    def test_parallel_payments_never_oversell_or_double_count(self):
+        category = Category.objects.create(name="Socks", slug="socks")
+        product = Product.objects.create(category=category, name="Sock", base_price=5)
+        variant = ProductVariant.objects.create(product=product, name="One", sku="sock", stock=self.stock)
+        order_ids = [make_paid_ready_order(None, variant, 1).pk for _ in range(self.orders)]
+
+        def pay(order_id):
+            try:
+                # Every order is paid twice, as a retried webhook would.
+                for _ in range(2):
+                    order = Order.objects.get(pk=order_id)
+                    order.status = "paid"
+                    order.save()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(pay, order_ids))
+
+        variant.refresh_from_db()
+        self.assertEqual(variant.stock, 0)
+        self.assertEqual(Order.objects.filter(stock_committed=True).count(), self.orders)
@@ -1,27 +1,28 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from cart.models import Cart
-from .models import Order, OrderItem
+from .models import Order
+from .services import CheckoutError, place_order
 
 @login_required
 def checkout(request):
-    cart = request.user.cart
+    cart, _ = Cart.objects.get_or_create(user=request.user)
+    error = None
     if request.method == "POST":
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=cart.total_price,
-        )
-        for item in cart.items.select_related("variant"):
-            OrderItem.objects.create(
-                order=order,
-                variant=item.variant,
-                price=item.variant.final_price,
-                quantity=item.quantity,
-            )
-        cart.items.all().delete()
-        return redirect("orders:order_detail", transaction_id=order.transaction_id)
+        try:
+            order = place_order(request.user, cart)
+        except CheckoutError as exc:
+            error = str(exc)
+        else:
+            return redirect("orders:order_detail", transaction_id=order.transaction_id)
 
-    return render(request, "orders/checkout.html", {"cart": cart})
+    items = list(cart.items.select_related("variant__product"))
+    return render(request, "orders/checkout.html", {
+        "cart": cart,
+        "items": items,
+        "total": sum(item.subtotal for item in items),
+        "error": error,
+    })
 
 
 @login_required
@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import WebhookEvent
 
-# Register your models here.
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "provider", "event_type", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("status", "provider", "event_type")
+    search_fields = ("event_id",)
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
@@ -0,0 +1,7 @@
+from core.query_plans import hot_query
+from .models import WebhookEvent
+
+
+@hot_query("payments:webhook_queue")
+def webhook_queue():
+    return WebhookEvent.objects.filter(status="pending").order_by("id")[:100]
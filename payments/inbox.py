@@ -0,0 +1,87 @@
+import logging
+from django.db import transaction
+from django.utils import timezone
+from orders.models import Order
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+class MalformedEvent(ValueError):
+    pass
+
+
+def _approved_transaction_id(event):
+    """The order an approval event pays for, None for other event types."""
+    if event.event_type != "CHECKOUT.ORDER.APPROVED":
+        return None
+    resource = event.payload.get("resource") if isinstance(event.payload, dict) else None
+    transaction_id = resource.get("invoice_id") if isinstance(resource, dict) else None
+    if not isinstance(transaction_id, str):
+        raise MalformedEvent("resource.invoice_id is missing or not a string")
+    return transaction_id
+
+
+def process_batch(batch_size=100):
+    """
+    Apply up to ``batch_size`` pending webhook events and return how many
+    were handled. Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED
+    where supported, so several workers can drain the inbox side by side.
+    Events that cannot be parsed are failed at once instead of retried, so
+    one bad payload cannot hold up the queue.
+    """
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("id")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        now = timezone.now()
+        transaction_ids = {}
+        for event in events:
+            event.attempts += 1
+            try:
+                transaction_ids[event.pk] = _approved_transaction_id(event)
+            except MalformedEvent as exc:
+                logger.warning("Webhook event %s is malformed: %s", event.event_id, exc)
+                event.status = "failed"
+                event.error = str(exc)
+
+        wanted = set(transaction_ids.values()) - {None}
+        orders = Order.objects.in_bulk(wanted, field_name="transaction_id") if wanted else {}
+
+        for event in events:
+            if event.pk not in transaction_ids:
+                continue
+            try:
+                with transaction.atomic():
+                    order = orders.get(transaction_ids[event.pk])
+                    if order is not None and order.status != "paid":
+                        order.status = "paid"
+                        order.save(update_fields=["status"])
+            except Exception as exc:
+                logger.exception("Webhook event %s failed", event.event_id)
+                event.error = str(exc)
+                event.status = "failed" if event.attempts >= MAX_ATTEMPTS else "pending"
+            else:
+                event.status = "processed"
+                event.error = ""
+                event.processed_at = now
+
+        WebhookEvent.objects.bulk_update(events, ["status", "attempts", "error", "processed_at"])
+    return len(events)
+
+
+def drain(batch_size=100):
+    """Process batches until the inbox has no pending events left."""
+    total = 0
+    while True:
+        handled = process_batch(batch_size)
+        if not handled:
+            return total
+        total += handled
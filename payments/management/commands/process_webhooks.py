@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from payments.inbox import drain
+
+
+class Command(BaseCommand):
+    help = "Apply pending payment webhook events from the inbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--workers", type=int, default=1, help="Threads draining the inbox in parallel.")
+        parser.add_argument("--once", action="store_true", help="Drain the inbox once and exit.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the inbox is empty.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+
+        def work(_):
+            try:
+                return drain(batch_size)
+            finally:
+                connections.close_all()
+
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            while True:
+                if pool:
+                    handled = sum(pool.map(work, range(workers)))
+                else:
+                    handled = drain(batch_size)
+                if handled:
+                    self.stdout.write(f"Processed {handled} webhook events.")
+                if options["once"]:
+                    break
+                if not handled:
+                    time.sleep(options["interval"])
+        finally:
+            if pool:
+                pool.shutdown()
@@ -1,3 +1,31 @@
 from django.db import models
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    """
+    A provider callback, stored as soon as it arrives and applied later by
+    ``manage.py process_webhooks``. ``event_id`` is unique so provider
+    retries are dropped by the index on insert.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+
+    provider = models.CharField(max_length=20, default="paypal")
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100, blank=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"], name="payments_webhook_queue_idx")]
+
+    def __str__(self):
+        return f"{self.provider} {self.event_type} {self.event_id}"
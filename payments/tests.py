@@ -1,3 +1,101 @@
+import json
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from catalogue.models import Category, Product, ProductVariant
+from orders.models import Order, OrderItem
+from .inbox import drain
+from .models import WebhookEvent
 
-# Create your tests here.
+
+class PaypalWebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Hats", slug="hats")
+        product = Product.objects.create(category=category, name="Hat", base_price=15)
+        cls.variant = ProductVariant.objects.create(product=product, name="One", sku="hat", stock=3)
+
+    def make_order(self):
+        order = Order.objects.create(total_amount=15)
+        OrderItem.objects.create(order=order, variant=self.variant, price=15, quantity=1)
+        return order
+
+    def post(self, payload):
+        return self.client.post(
+            reverse("payments:paypal_webhook"), json.dumps(payload), content_type="application/json"
+        )
+
+    def approved(self, event_id, order):
+        return {
+            "id": event_id,
+            "event_type": "CHECKOUT.ORDER.APPROVED",
+            "resource": {"invoice_id": order.transaction_id},
+        }
+
+    def test_acknowledges_without_touching_the_order(self):
+        order = self.make_order()
+        with self.assertNumQueries(1):
+            response = self.post(self.approved("WH-1", order))
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "pending")
+        self.assertEqual(WebhookEvent.objects.get().status, "pending")
+
+    def test_duplicate_deliveries_are_stored_once(self):
+        order = self.make_order()
+        for _ in range(3):
+            self.assertEqual(self.post(self.approved("WH-1", order)).status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_rejects_malformed_payloads(self):
+        response = self.client.post(reverse("payments:paypal_webhook"), "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_stores_null_and_oversized_identifiers(self):
+        for payload in (
+            {"id": "WH-1", "event_type": None},
+            {"id": 12345, "event_type": "X" * 150},
+            {"id": "W" * 300, "event_type": "PAYMENT.CAPTURE.DENIED"},
+        ):
+            self.assertEqual(self.post(payload).status_code, 200)
+        stored = WebhookEvent.objects.values_list("event_id", "event_type")
+        self.assertEqual(sorted((len(i), len(t)) for i, t in stored), [(4, 0), (5, 100), (255, 22)])
+
+    def test_worker_marks_orders_paid_once(self):
+        first, second = self.make_order(), self.make_order()
+        self.post(self.approved("WH-1", first))
+        self.post(self.approved("WH-2", second))
+        self.post({"id": "WH-3", "event_type": "PAYMENT.CAPTURE.DENIED", "resource": {}})
+
+        self.assertEqual(drain(batch_size=2), 3)
+        self.assertEqual(drain(), 0)
+
+        self.assertEqual(set(Order.objects.values_list("status", flat=True)), {"paid"})
+        self.assertEqual(set(WebhookEvent.objects.values_list("status", flat=True)), {"processed"})
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 1)
+
+    def test_malformed_events_fail_without_blocking_the_queue(self):
+        order = self.make_order()
+        for event_id, resource in (("WH-1", "not-an-object"), ("WH-2", {"invoice_id": ["A", "B"]})):
+            self.post({"id": event_id, "event_type": "CHECKOUT.ORDER.APPROVED", "resource": resource})
+        self.post(self.approved("WH-3", order))
+
+        self.assertEqual(drain(), 3)
+        self.assertEqual(
+            dict(WebhookEvent.objects.values_list("event_id", "status")),
+            {"WH-1": "failed", "WH-2": "failed", "WH-3": "processed"},
+        )
+        order.refresh_from_db()
+        self.assertEqual(order.status, "paid")
+
+    def test_process_webhooks_command(self):
+        order = self.make_order()
+        self.post(self.approved("WH-1", order))
+        out = StringIO()
+        call_command("process_webhooks", "--once", stdout=out)
+        self.assertIn("Processed 1 webhook events.", out.getvalue())
+        order.refresh_from_db()
+        self.assertEqual(order.status, "paid")
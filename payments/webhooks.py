@@ -1,26 +1,42 @@
+import hashlib
 import json
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
-from orders.models import Order
+from .models import WebhookEvent
+
+
+def _max_length(field):
+    return WebhookEvent._meta.get_field(field).max_length
+
 
 @csrf_exempt
 def paypal_webhook(request):
     if request.method != "POST":
         return HttpResponseBadRequest("Invalid method")
 
-    payload = request.body.decode("utf-8")
-    data = json.loads(payload)
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return HttpResponseBadRequest("Invalid payload")
+    if not isinstance(data, dict):
+        return HttpResponseBadRequest("Invalid payload")
 
-    # Extract transaction id / custom id from PayPal payload
-    transaction_id = data.get("resource", {}).get("invoice_id")  # adjust to actual field
-    event_type = data.get("event_type")
+    # PayPal retries with the same event id; fall back to a body hash if it is missing.
+    event_id = str(data.get("id") or hashlib.sha256(request.body).hexdigest())
+    event_type = str(data.get("event_type") or "")
 
-    if event_type == "CHECKOUT.ORDER.APPROVED" and transaction_id:
-        try:
-            order = Order.objects.get(transaction_id=transaction_id)
-            order.status = "paid"
-            order.save()
-        except Order.DoesNotExist:
-            pass
+    # Store and acknowledge only; payments.inbox applies the event out of band.
+    # The unique index on event_id turns provider retries into a no-op insert.
+    WebhookEvent.objects.bulk_create(
+        [
+            WebhookEvent(
+                provider="paypal",
+                event_id=event_id[:_max_length("event_id")],
+                event_type=event_type[:_max_length("event_type")],
+                payload=data,
+            )
+        ],
+        ignore_conflicts=True,
+    )
 
     return HttpResponse("OK")